@@ -0,0 +1,105 @@
+"""
+Aggregation layer of the mlperf runs, shared by the time-to-threshold
+plots.
+
+The runs are the entries imported in the matrix, so the duplicated
+directories it ignored are ignored here too. They are indexed by their
+(gpu_type, gpu_count, pod_count, mig_strategy, threshold) settings,
+and the values the plots need (the final time of each GPU, their
+processing speed and their threshold curves) are derived once, the
+first time the index is queried after the results were (re)loaded.
+"""
+
+from common import Matrix
+
+INDEX_KEYS = ("gpu_type", "gpu_count", "pod_count", "mig_strategy", "threshold")
+
+class Run():
+    """
+    One run directory: the `params`, `location` and `results` of its
+    matrix entry, and the values derived from them.
+    """
+
+    __slots__ = ("position", "location", "params", "values", "results", "curves", "final_times", "speeds")
+
+    def __init__(self, position, entry):
+        self.position = position # in the import order
+        self.location = entry.location
+        self.params = entry.params
+        # the params as strings, like the values of the plot params
+        self.values = {key: str(value) for key, value in vars(entry.params).items()}
+        self.results = entry.results
+
+        # (log filename, mllog.ThresholdSeries) of the GPUs with threshold values
+        self.curves = [(log_filename, values) for log_filename, values in entry.results.thresholds.items()
+                       if len(values)]
+        # time (in minutes) when each GPU reached its last threshold
+        self.final_times = [values.final_ts("min") for _, values in self.curves]
+        # average samples / sec of each GPU
+        self.speeds = list(entry.results.avg_sample_sec.values())
+
+
+_index = None # index key -> [Run], built from the matrix entries when first queried
+
+def invalidate():
+    """Drops the index, the matrix entries or their results were updated."""
+
+    global _index
+
+    _index = None
+
+def _build_index():
+    index = {}
+    for position, entry in enumerate(Matrix.import_map.values()):
+        run = Run(position, entry)
+        key = tuple(run.values.get(index_key) for index_key in INDEX_KEYS)
+        index.setdefault(key, []).append(run)
+
+    return index
+
+def query(params, param_lists, gpu_types=None):
+    """
+    Returns the runs matching the `params` and `param_lists` of a plot,
+    in the order of `Matrix.all_records`: the entries of
+    `param_lists` are combined, the other parameters must match unless
+    they're '---'.
+
+    If the `gpu_types` predicate is given, only the runs whose
+    gpu_type it accepts are returned.
+    """
+
+    global _index
+
+    index = _index
+    if index is None:
+        index = _index = _build_index()
+
+    listed = {} # key -> {value: position in its param list}
+    for param_list in param_lists:
+        for position, (key, value) in enumerate(param_list):
+            listed.setdefault(key, {}).setdefault(str(value), position)
+
+    fixed = {key: str(value) for key, value in params.items()
+             if key not in listed and value != "---"}
+
+    def matches(values):
+        return all(values.get(key, value) == value for key, value in fixed.items()) \
+            and all(values.get(key) in allowed for key, allowed in listed.items() if key in values)
+
+    selected = []
+    for key, runs in index.items():
+        if gpu_types is not None and (key[0] is None or not gpu_types(key[0])):
+            continue
+
+        if not matches({index_key: value for index_key, value in zip(INDEX_KEYS, key)
+                        if value is not None}):
+            continue
+
+        selected += [run for run in runs if matches(run.values)]
+
+    # product order of the param lists, the gathered runs in their import order
+    ordered_keys = [key for key in listed]
+    selected.sort(key=lambda run: ([listed[key].get(run.values.get(key), -1)
+                                    for key in ordered_keys], run.position))
+
+    return selected
@@ -0,0 +1,153 @@
+#! /usr/bin/python3
+
+"""
+On-disk cache of the parsed mlperf results, stored as a sidecar file in
+each result directory.
+
+The cache of a directory is valid as long as none of its `run-*.log`
+and `metrics/prom_*.json` files changed (path, size and mtime), and the
+parser code (mllog.py and store.py) is the one which generated it.
+
+The cache files are plain JSON data, as the result trees are often
+downloaded from elsewhere: a cache file can't do more than provide
+wrong results. A stale cache file isn't used, the directory is parsed
+again.
+
+Usage: python3 -m plugins.mlperf.cache RESULTS_DIR [--stale] [--older-than DAYS]
+to remove the cache files of a results tree.
+"""
+
+import os
+import sys
+import glob
+import time
+import json
+import argparse
+
+from plugins.shared import sidecar
+
+CACHE_FILENAME = ".mlperf_results.cache"
+CACHE_FORMAT_VERSION = 3
+
+PARSER_FILES = ["mllog.py", "store.py"]
+
+def enabled():
+    return os.environ.get("MATBENCH_MLPERF_CACHE", "1") != "0"
+
+def parser_version():
+    return sidecar.parser_version(__file__, PARSER_FILES)
+
+def key(dirname):
+    """
+    Returns the (relative path, size, mtime) list of the files the
+    results of `dirname` are parsed from.
+    """
+
+    files = glob.glob(f"{dirname}/run-*.log") + glob.glob(f"{dirname}/metrics/prom_*.json")
+
+    entries = []
+    for fname in sorted(files):
+        stat = os.stat(fname)
+        entries.append((os.path.relpath(fname, dirname), stat.st_size, stat.st_mtime_ns))
+
+    return entries
+
+def _read(dirname, header_only=False):
+    try:
+        with open(os.path.join(dirname, CACHE_FILENAME), "rb") as f:
+            # the header is on the first line
+            header = json.loads(f.readline())
+            if header.get("format") != CACHE_FORMAT_VERSION:
+                return None
+
+            if header.get("parser") != parser_version():
+                return None
+
+            header["key"] = [(str(relpath), int(size), int(mtime)) for relpath, size, mtime in header["key"]]
+            if header_only:
+                return header
+
+            content = json.loads(f.readline())
+
+            return header | content
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"WARNING: failed to load the results cache of '{dirname}': {e.__class__.__name__}: {e}")
+        return None
+
+def read(dirname):
+    """
+    Returns the cache content of `dirname`, or None if it is missing
+    or was generated by another version of the format or of the parser.
+    The results are the JSON data given to `write`.
+    """
+
+    return _read(dirname)
+
+def write(dirname, key, results):
+    header = dict(
+        format=CACHE_FORMAT_VERSION,
+        parser=parser_version(),
+        key=key,
+    )
+    content = dict(
+        results=results,
+    )
+
+    def write_cache(f):
+        # the header is stored on the first line, to check the cache
+        # validity without loading the results
+        print(json.dumps(header), file=f)
+        print(json.dumps(content), file=f)
+
+    try:
+        sidecar.write_atomic(os.path.join(dirname, CACHE_FILENAME), write_cache)
+    except Exception as e:
+        print(f"WARNING: failed to save the results cache of '{dirname}': {e.__class__.__name__}: {e}")
+
+def is_stale(dirname):
+    header = _read(dirname, header_only=True)
+
+    return header is None or header["key"] != key(dirname)
+
+def cleanup(results_dir, stale_only=False, older_than=None):
+    """
+    Removes the cache files of `results_dir`, only the stale ones if
+    `stale_only` is set, only those not updated since `older_than`
+    days if it is set. Returns the number of files removed.
+    """
+
+    removed = 0
+    now = time.time()
+    for cache_file in glob.glob(f"{results_dir}/**/{CACHE_FILENAME}", recursive=True):
+        dirname = os.path.dirname(cache_file)
+
+        if older_than is not None and now - os.stat(cache_file).st_mtime < older_than * 24 * 60 * 60:
+            continue
+
+        if stale_only and not is_stale(dirname):
+            continue
+
+        os.unlink(cache_file)
+        removed += 1
+
+    return removed
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove the mlperf results cache files.")
+    parser.add_argument("results_dir")
+    parser.add_argument("--stale", action="store_true",
+                        help="only remove the cache files which are not valid anymore")
+    parser.add_argument("--older-than", type=float, metavar="DAYS",
+                        help="only remove the cache files not updated since DAYS days")
+
+    args = parser.parse_args()
+
+    removed = cleanup(args.results_dir, stale_only=args.stale, older_than=args.older_than)
+    print(f"Removed {removed} cache file{'s' if removed != 1 else ''} from {args.results_dir}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
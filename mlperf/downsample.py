@@ -0,0 +1,66 @@
+"""
+Downsampling of the (timestamp, value) series, to plot them with about
+one point per pixel.
+"""
+
+import numpy as np
+
+def lttb(ts, values, n_out, extremes=False):
+    """
+    Largest-Triangle-Three-Buckets reduction of the series to `n_out`
+    points, which keeps the visual shape (peaks and valleys) of the
+    series.
+
+    If `extremes` is set, the minimum and the maximum of each bucket are
+    kept too, so that no spike is lost. The series is then split in a
+    third as many buckets, to keep at most `n_out` points.
+
+    Returns the reduced (ts, values) arrays.
+    """
+
+    n_in = len(ts)
+    if n_out >= n_in or n_out < 3:
+        return ts, values
+
+    valid = np.isfinite(values)
+    if not valid.all():
+        ts, values = ts[valid], values[valid]
+        n_in = len(ts)
+        if n_out >= n_in:
+            return ts, values
+
+    # the first and last points are always kept,
+    # the others are split in buckets of one (or three) points
+    n_buckets = n_out - 2
+    if extremes and n_buckets >= 3:
+        n_buckets //= 3
+    else:
+        extremes = False
+
+    edges = np.linspace(1, n_in - 1, n_buckets + 1).astype(np.int64)
+
+    selected = [0]
+
+    prev = 0
+    for i in range(n_buckets):
+        start, stop = edges[i], edges[i + 1]
+
+        # average point of the next bucket
+        next_start, next_stop = stop, (edges[i + 2] if i + 2 < len(edges) else n_in)
+        next_ts = ts[next_start:next_stop].mean()
+        next_value = values[next_start:next_stop].mean()
+
+        # point of the current bucket with the largest triangle area
+        bucket = values[start:stop]
+        area = np.abs((ts[prev] - next_ts) * (bucket - values[prev])
+                      - (ts[prev] - ts[start:stop]) * (next_value - values[prev]))
+        prev = start + int(area.argmax())
+
+        if extremes:
+            selected += sorted({prev, start + int(bucket.argmin()), start + int(bucket.argmax())})
+        else:
+            selected.append(prev)
+
+    selected.append(n_in - 1)
+
+    return ts[selected], values[selected]
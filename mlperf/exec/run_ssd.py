@@ -6,6 +6,7 @@ import subprocess
 import time
 import datetime
 import json
+import threading
 from pathlib import Path
 from collections import defaultdict
 
@@ -52,6 +53,10 @@ ENABLE_THANOS = True
 thanos = None
 thanos_start = None
 
+ENABLE_LIVE_LOGS = True # stream the Pod logs into the artifacts directory during the execution
+LIVE_LOGS_STOP_TIMEOUT = 5 # seconds to wait for the log streams to stop
+log_streams = {} # pod name -> LogStream
+
 benchmark = None
 
 APP_NAME = "run-mlperf"
@@ -353,6 +358,75 @@ def create_job(k8s_res_type, settings, gpu_config, opts):
     print()
     print(f"Job '{k8s_res_type}' for {run_descr} created!")
 
+class LogStream():
+    """
+    Streams the logs of a Pod into the artifacts directory, until
+    `stop()` is called. Nothing is written into the log file once the
+    stream is stopped, so that the final logs can replace it.
+    """
+
+    def __init__(self, pod_name):
+        self.pod_name = pod_name
+        self.lock = threading.Lock()
+        self.stopped = False
+        self.resp = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        dest_fname = ARTIFACTS_DIR / f"{self.pod_name}.log"
+        try:
+            resp = v1.read_namespaced_pod_log(namespace=NAMESPACE, name=self.pod_name,
+                                              follow=True, _preload_content=False)
+            with self.lock:
+                if self.stopped:
+                    resp.release_conn()
+                    return
+
+                self.resp = resp
+                out_f = open(dest_fname, "wb")
+
+            with out_f:
+                for chunk in resp.stream():
+                    with self.lock:
+                        if self.stopped:
+                            break
+
+                        out_f.write(chunk)
+                        out_f.flush()
+        except Exception as e:
+            if not self.stopped:
+                print(f"\nWARNING: streaming of pod/{self.pod_name} logs interrupted: {e}")
+
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+            resp = self.resp
+
+        # interrupts the read of the next chunk
+        if resp is not None:
+            try:
+                resp.close()
+            except Exception:
+                pass
+
+def start_log_stream(pod_name):
+    if pod_name in log_streams:
+        return
+
+    stream = log_streams[pod_name] = LogStream(pod_name)
+    stream.thread.start()
+
+def stop_log_streams():
+    for stream in log_streams.values():
+        stream.stop()
+
+    deadline = time.time() + LIVE_LOGS_STOP_TIMEOUT
+    for pod_name, stream in log_streams.items():
+        stream.thread.join(max(deadline - time.time(), 0))
+        if stream.thread.is_alive():
+            # stopped anyway, it won't write into the log file anymore
+            print(f"WARNING: pod/{pod_name} logs stream still blocked after {LIVE_LOGS_STOP_TIMEOUT}s")
+
 def await_completion(opts):
     print("=====")
 
@@ -427,6 +501,9 @@ def await_completion(opts):
             phase = pod.status.phase
 
             if phase == "Running":
+                if ENABLE_LIVE_LOGS:
+                    start_log_stream(pod.metadata.name)
+
                 if no_sync and exec_start is None:
                     print("Execution started!")
                     exec_start = datetime.datetime.now()
@@ -624,6 +701,9 @@ def save_artifacts(is_successful):
 
     failed = not is_successful
 
+    # the complete logs are saved below, over the streamed ones
+    stop_log_streams()
+
     pods = v1.list_namespaced_pod(namespace=NAMESPACE,
                                   label_selector=f"app={APP_NAME}")
     for pod in pods.items:
@@ -0,0 +1,296 @@
+import os
+import json
+import types
+import mmap
+import hashlib
+
+import numpy as np
+
+MLLOG_PREFIX = ":::MLLOG "
+
+# the lines parsed by PodLogParser.parse_line all contain one of these markers
+LINE_MARKERS = [
+    b"result=",
+    b"avg. samples / sec",
+    b'"key": "eval_accuracy"',
+    b'"key": "init_start"',
+]
+
+# size of the head and of the tail of the parsed bytes hashed by the parser checkpoints
+PREFIX_CHECK_SIZE = 64 * 1024
+
+# divisor to convert the threshold timestamps (in ms) to these units
+TS_UNITS = {
+    "ms": 1,
+    "s": 1000,
+    "min": 1000 * 60,
+    "hr": 1000 * 60 * 60,
+}
+
+class ThresholdSeries():
+    """
+    Time-to-threshold values of one GPU, stored as two contiguous float
+    arrays: the thresholds and the time (in ms) since the GPU init_start.
+    """
+
+    __slots__ = ("thr", "ts_ms")
+
+    def __init__(self, values):
+        values = np.array(values, dtype=np.float64).reshape(-1, 2)
+
+        self.thr = np.ascontiguousarray(values[:, 0])
+        self.ts_ms = np.ascontiguousarray(values[:, 1])
+
+    def __len__(self):
+        return len(self.thr)
+
+    def extend(self, values):
+        """Returns a new series, with the [threshold, ts] `values` appended to this one."""
+
+        added = ThresholdSeries(values)
+
+        series = ThresholdSeries.__new__(ThresholdSeries)
+        series.thr = np.concatenate([self.thr, added.thr])
+        series.ts_ms = np.concatenate([self.ts_ms, added.ts_ms])
+
+        return series
+
+    def ts(self, unit="ms"):
+        return self.ts_ms / TS_UNITS[unit]
+
+    def final_ts(self, unit="ms"):
+        return self.ts_ms[-1] / TS_UNITS[unit]
+
+def _split_line(raw_line):
+    # same line splitting as a text-mode file (universal newlines)
+    return raw_line.decode().replace("\r\n", "\n").split("\r")
+
+def prefix_digest(log_f, size):
+    """
+    Returns the hash of the first `size` bytes of `log_f` (opened in
+    binary mode): only their head and their tail are read, so that the
+    check stays cheap for large files.
+    """
+
+    digest = hashlib.sha1(str(size).encode())
+
+    log_f.seek(0)
+    digest.update(log_f.read(min(size, PREFIX_CHECK_SIZE)))
+    if size > PREFIX_CHECK_SIZE:
+        tail_start = max(size - PREFIX_CHECK_SIZE, PREFIX_CHECK_SIZE)
+        log_f.seek(tail_start)
+        digest.update(log_f.read(size - tail_start))
+
+    return digest.hexdigest()
+
+def iter_log_lines(log_f, offset=0, final=True):
+    """
+    Yields the (end_offset, line) tuples of the lines of `log_f`
+    (opened in binary mode), starting at byte `offset`.
+
+    If `final` is False, a trailing line without its newline is not
+    consumed, so that it can be parsed once the writer completes it.
+    """
+
+    log_f.seek(offset)
+    for raw_line in log_f:
+        if not final and not raw_line.endswith(b"\n"):
+            return
+
+        offset += len(raw_line)
+
+        for line in _split_line(raw_line):
+            yield offset, line
+
+def iter_marked_lines(log_f, offset=0, final=True):
+    """
+    Yields the (end_offset, line) tuples of the lines of `log_f`
+    containing one of the LINE_MARKERS, starting at byte `offset`. Same
+    as `iter_log_lines`, minus the lines which cannot match, but the
+    file is memory-mapped and scanned at the bytes level: only the
+    matching lines are decoded.
+    """
+
+    size = os.fstat(log_f.fileno()).st_size
+    if size <= offset:
+        return
+
+    with mmap.mmap(log_f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        end = size if final else buf.rfind(b"\n", offset, size) + 1
+        if end <= offset:
+            return
+
+        # next position of each of the markers
+        next_pos = [buf.find(marker, offset, end) for marker in LINE_MARKERS]
+
+        pos = offset
+        while True:
+            found = [marker_pos for marker_pos in next_pos if marker_pos != -1]
+            if not found:
+                # the lines without markers are consumed all the same
+                yield end, ""
+                return
+
+            match_pos = min(found)
+            line_start = buf.rfind(b"\n", pos, match_pos) + 1
+            line_start = max(line_start, pos)
+
+            line_end = buf.find(b"\n", match_pos, end) + 1 or end
+
+            for line in _split_line(buf[line_start:line_end]):
+                yield line_end, line
+
+            pos = line_end
+            next_pos = [marker_pos if marker_pos >= pos or marker_pos == -1
+                        else buf.find(marker, pos, end)
+                        for marker, marker_pos in zip(LINE_MARKERS, next_pos)]
+
+class PodLogParser():
+    """
+    Incremental parser of one `run-*.log` pod log file.
+
+    The parser state is kept between calls to `parse`, so that a file
+    which grew since the last parse is only read from `self.offset`.
+    The bytes parsed are checked before resuming, in case the file was
+    rewritten in place.
+
+    The thresholds of each GPU are kept as a ThresholdSeries, shared
+    with the results, and the points parsed are appended to it at the
+    end of each parse.
+    """
+
+    def __init__(self, name, stat=None):
+        self.name = name
+        self.st_dev = stat.st_dev if stat else None
+        self.st_ino = stat.st_ino if stat else None
+        self.st_mtime_ns = None
+        self.offset = 0
+        self.digest = None # prefix_digest of the bytes parsed
+        self.complete = False # the last parse reached the end of the file
+
+        self.exec_time = None
+        self.avg_sample_sec = {}
+        self.thresholds = {} # gpu name -> ThresholdSeries
+        self.new_points = {} # gpu name -> [threshold, ts] points of the current parse
+
+        self.has_thr020 = set()
+        self.prev_thr = {}
+        self.start_timestamps = {}
+
+    def can_resume(self, stat, log_f):
+        """Tells if the parsing can resume on `log_f` (opened in binary mode), of `stat`."""
+
+        if (stat.st_dev, stat.st_ino) != (self.st_dev, self.st_ino) or stat.st_size < self.offset:
+            return False
+
+        if not self.offset:
+            return True
+
+        if self.st_mtime_ns is not None and stat.st_mtime_ns < self.st_mtime_ns:
+            return False
+
+        return prefix_digest(log_f, self.offset) == self.digest
+
+    def parse(self, log_f, final=True, scan=False):
+        """
+        Parses `log_f` (opened in binary mode) from `self.offset`.
+
+        If `scan` is set, the file is memory-mapped, and only the lines
+        containing one of the LINE_MARKERS are decoded and parsed.
+        """
+
+        iter_lines = iter_marked_lines if scan else iter_log_lines
+
+        try:
+            for offset, line in iter_lines(log_f, self.offset, final):
+                self.parse_line(line)
+                self.offset = offset
+        finally:
+            for gpu_name, points in self.new_points.items():
+                self.thresholds[gpu_name] = self.thresholds[gpu_name].extend(points)
+            self.new_points = {}
+
+        stat = os.fstat(log_f.fileno())
+        self.st_mtime_ns = stat.st_mtime_ns
+        self.complete = self.offset == stat.st_size
+        self.digest = prefix_digest(log_f, self.offset)
+
+    def parse_line(self, line):
+        if "result=" in line:
+            self.exec_time = int(line.split('=')[-1].strip())/60
+
+        if "avg. samples / sec" in line:
+            gpu_name = "single" if not line.startswith("/tmp") else \
+                line.split(":")[0]
+
+            self.avg_sample_sec[gpu_name] = float(line.split("avg. samples / sec: ")[-1].strip())
+
+        if '"key": "eval_accuracy"' in line or '"key": "init_start"' in line:
+            if line.startswith(MLLOG_PREFIX):
+                gpu_name = "full_gpu"
+            else:
+                gpu_name = line.partition(MLLOG_PREFIX)[0]
+
+            json_content = json.loads(line.partition(MLLOG_PREFIX)[-1])
+            line_ts = json_content['time_ms']
+
+            if json_content['key'] == "eval_accuracy":
+                if gpu_name in self.has_thr020: return
+                line_threshold = json_content['value']
+                if line_threshold < self.prev_thr.get(gpu_name, 0): return
+                self.prev_thr[gpu_name] = line_threshold
+                try:
+                    threadhold_time = line_ts - self.start_timestamps[gpu_name]
+                    self.new_points.setdefault(gpu_name, []).append([line_threshold, threadhold_time])
+                    if line_threshold > 0.2: self.has_thr020.add(gpu_name)
+                except KeyError:
+                    raise Exception(f"gpu_name={gpu_name} didn't start in {self.name}")
+
+            elif json_content['key'] == "init_start":
+                if gpu_name in self.start_timestamps:
+                    if gpu_name != "full_gpu":
+                        raise Exception(f"Duplicated gpu_name={gpu_name} found in {self.name}")
+                    else:
+                        # running with in multi-GPU mode,
+                        # keep only the 1st timestamp
+                        return
+
+                self.start_timestamps[gpu_name] = line_ts
+
+                self.thresholds[gpu_name] = ThresholdSeries([])
+                self.new_points.pop(gpu_name, None)
+
+    def update_results(self, results):
+        if self.exec_time is not None:
+            results.exec_time = self.exec_time
+
+        results.avg_sample_sec.update(self.avg_sample_sec)
+        # the series are shared, they're replaced and not modified by the next parse
+        results.thresholds.update(self.thresholds)
+
+def results_to_dict(results):
+    """Returns the parsed `results` of a directory as plain JSON-serializable data."""
+
+    state = dict(
+        pod_names=sorted(results.pod_names),
+        thresholds={gpu_name: np.stack([values.thr, values.ts_ms], axis=1).tolist()
+                    for gpu_name, values in results.thresholds.items()},
+        avg_sample_sec=results.avg_sample_sec,
+    )
+    if hasattr(results, "exec_time"):
+        state["exec_time"] = results.exec_time
+
+    return state
+
+def results_from_dict(state):
+    """Creates the results from the `results_to_dict` state. Raises an error if the state is invalid."""
+
+    results = types.SimpleNamespace()
+    results.pod_names = {str(pod_name) for pod_name in state["pod_names"]}
+    results.thresholds = {str(gpu_name): ThresholdSeries(values)
+                          for gpu_name, values in state["thresholds"].items()}
+    results.avg_sample_sec = {str(k): float(v) for k, v in state["avg_sample_sec"].items()}
+    if state.get("exec_time") is not None:
+        results.exec_time = float(state["exec_time"])
+
+    return results
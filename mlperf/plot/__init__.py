@@ -6,10 +6,14 @@ from plugins.prom.plot import overview as prom_overview
 from plugins.mlperf.plot import time_to_threshold
 from plugins.mlperf.plot import report
 from plugins.mlperf.plot import directories
+from plugins.mlperf import watch
+from plugins.mlperf import store as mlperf_store
 
 import store
 
 def register():
+    other_stats = set(TableStats.stats_by_name)
+
     TableStats.ValueDev("speed", "Speed", "avg_sample_sec", ".2f", "avg. samples / sec", higher_better=True)
     TableStats.ValueDev("exec_time", "Execution Time", "exec_time", ".2f", "minutes", divisor=60, higher_better=False)
     directories.Directories()
@@ -32,8 +36,14 @@ def register():
         'DCGM_FI_PROF_DRAM_ACTIVE': "% of cycles the memory is active (tx/rx)",
         'DCGM_FI_DEV_POWER_USAGE': "Watt",
     }
-    #for metric, y_title in METRICS.items():
-    #    prom_overview.Plot(metric=metric, y_title=y_title)
-    #    report.PrometheusMultiGPUReport(metric)
+    for metric, y_title in METRICS.items():
+        prom_overview.Plot(metric=metric, y_title=y_title)
+        report.PrometheusMultiGPUReport(metric)
 
     report.OverviewReport()
+
+    if mlperf_store._watch_enabled():
+        # the watch mode updates the results from its thread, while these stats read them
+        for name, stat in TableStats.stats_by_name.items():
+            if name not in other_stats:
+                watch.lock_results(stat)
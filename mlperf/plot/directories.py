@@ -1,8 +1,86 @@
+import threading
+import collections
 
 from dash import html
 from common import Matrix
 import matrix_view.table_stats
 
+from plugins.shared import figure_cache
+
+DEFAULT_PAGE_SIZE = 100
+MAX_INDEXES = 16
+
+class DirectoryIndex():
+    """
+    The result locations matching a set of plot parameters, sorted by
+    their settings key, with the lower-case text searched by the
+    filter.
+    """
+
+    __slots__ = ("keys", "locations", "texts")
+
+    def __init__(self, ordered_vars, params, param_lists):
+        elements = {}
+        for entry in Matrix.all_records(params, param_lists):
+            key = " " + ", ".join([f"{k}={entry.params.__dict__[k]}" for k in reversed(ordered_vars)])
+
+            if entry.is_gathered:
+                for k, v in entry.gathered_keys.items():
+                    key += f", {k}={{{' '.join(v)}}}"
+
+            text = ", ".join([f"{k}={v}" for k, v in entry.params.__dict__.items()])
+            elements[key] = str(entry.location), f"{key}, {text}, {entry.location}".lower()
+
+        self.keys = sorted(elements)
+        self.locations = [elements[key][0] for key in self.keys]
+        self.texts = [elements[key][1] for key in self.keys]
+
+    def search(self, search):
+        """Returns the positions of the entries containing all the words of `search`."""
+
+        words = search.lower().split()
+        if not words:
+            return range(len(self.keys))
+
+        return [pos for pos, text in enumerate(self.texts) if all(word in text for word in words)]
+
+
+_indexes_lock = threading.Lock()
+_indexes = collections.OrderedDict() # (generation, params) -> DirectoryIndex
+
+def get_index(ordered_vars, params, param_lists):
+    key = (figure_cache.generation(), str(list(ordered_vars)),
+           str(sorted(params.items())), str(param_lists))
+
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+
+    index = DirectoryIndex(ordered_vars, params, param_lists)
+
+    with _indexes_lock:
+        # the indexes of the previous results can't be used anymore
+        for stale in [stale for stale in _indexes if stale[0] != key[0]]:
+            del _indexes[stale]
+
+        _indexes[key] = index
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+
+    return index
+
+def _cfg_int(cfg, key, default):
+    """Returns the `key` value of `cfg` as a positive integer, or `default` if it isn't one."""
+
+    try:
+        value = int(cfg.get(key, default))
+    except ValueError:
+        return default
+
+    return value if value > 0 else default
+
 class Directories():
     def __init__(self, mig_type=None, speed=False):
         self.name = "Directories"
@@ -17,26 +95,29 @@ class Directories():
         return "nothing"
 
     def do_plot(self, ordered_vars, params, param_lists, variables, cfg):
-        elts = [html.P(html.B(", ".join([f"{k}={v}" for k, v in params.items() if v != "---"])))]
+        # cfg: search=WORDS filters the directories, page=N and page-size=N select the page to show
+        search = cfg.get("search", "")
+        page_size = _cfg_int(cfg, "page-size", DEFAULT_PAGE_SIZE)
 
-        elements = {}
-        for entry in Matrix.all_records(params, param_lists):
-            gpu_name = entry.params.gpu_type
-            li_elts = []
+        index = get_index(ordered_vars, params, param_lists)
+        positions = index.search(search)
 
-            key = " " + ", ".join([f"{k}={entry.params.__dict__[k]}" for k in reversed(ordered_vars)])
+        page_count = max((len(positions) + page_size - 1) // page_size, 1)
+        page = min(_cfg_int(cfg, "page", 1), page_count)
+        first = (page - 1) * page_size
+        shown = positions[first:first + page_size]
 
-            if entry.is_gathered:
-                for k, v in entry.gathered_keys.items():
-                    key += f", {k}={{{' '.join(v)}}}"
+        elts = [html.P(html.B(", ".join([f"{k}={v}" for k, v in params.items() if v != "---"])))]
 
-            params = html.B(key)
-            li_elts.append(html.A("link", href="file://"+entry.location))
-            li_elts.append(html.Span(params))
+        matching = f" matching '{search}'" if search.strip() else ""
+        elts.append(html.P(f"Showing {first + 1 if shown else 0}-{first + len(shown)} of {len(positions)} directories"
+                           f"{matching}, page {page}/{page_count}"))
 
-            elements[key] = html.Li(li_elts)
+        for pos in shown:
+            li_elts = []
+            li_elts.append(html.A("link", href="file://"+index.locations[pos]))
+            li_elts.append(html.Span(html.B(index.keys[pos])))
 
-        for k in sorted(elements):
-            elts.append(elements[k])
+            elts.append(html.Li(li_elts))
 
         return None, html.Ul(elts)
@@ -1,4 +1,8 @@
+import os
 import copy
+import time
+import multiprocessing
+import concurrent.futures
 
 from dash import html
 from dash import dcc
@@ -6,9 +10,12 @@ from dash import dcc
 from common import Matrix
 import matrix_view.table_stats
 
+from plugins.shared import figure_cache
+
 def set_vars(settings, ordered_vars, params, param_lists, variables, cfg):
     _params = dict(params)
-    _variables = copy.deepcopy(variables)
+    # the values are copied, the stats may modify them
+    _variables = {key: copy.copy(values) for key, values in variables.items()}
     _ordered_vars = list(ordered_vars)
     for k, v in settings.items():
         _params[k] = v
@@ -20,6 +27,85 @@ def set_vars(settings, ordered_vars, params, param_lists, variables, cfg):
 
     return _ordered_vars, _params, _param_lists, _variables, cfg
 
+# min time (in seconds) of the rendering of a section for the other
+# ones to be rendered in processes, which take about as long to start
+PARALLEL_SECTION_TIME = 0.1
+
+def _report_workers():
+    # max number of processes rendering the sections of a report, 0 for one per CPU
+    workers = int(os.environ.get("MATBENCH_MLPERF_REPORT_WORKERS", 4))
+
+    return workers if workers > 0 else os.cpu_count()
+
+def _init_report_worker():
+    # the figures are cached by the dashboard process
+    os.environ["MATBENCH_FIGURE_CACHE_MB"] = "0"
+
+def _render_section(stat_name, plot_args):
+    stat = matrix_view.table_stats.TableStats.stats_by_name[stat_name]
+
+    return figure_cache.plot(stat, *plot_args)
+
+def _render_in_processes(sections, workers):
+    """
+    Renders the (stat, plot_args) `sections` in a pool of `workers`
+    processes. The processes are forked, so that they see the stats and
+    the results of the dashboard. Returns the (fig, msg) results.
+    """
+
+    context = multiprocessing.get_context("fork")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                                initializer=_init_report_worker) as executor:
+        futures = [executor.submit(_render_section, stat.name, plot_args)
+                   for stat, plot_args in sections]
+
+        return [future.result() for future in futures]
+
+def render_sections(sections, args):
+    """
+    Plots the (stat, settings) `sections` of a report, with the `args`
+    of the report's do_plot. The figures are cached like the plots.
+    Returns the figures in the order of `sections`.
+
+    The plots are CPU-bound Python code: if the first section missing
+    from the cache takes more than PARALLEL_SECTION_TIME to render, the
+    other ones are rendered in a pool of processes.
+    """
+
+    generation = figure_cache.generation()
+
+    plot_args = [set_vars(settings, *args) for _, settings in sections]
+    keys = [figure_cache.key(stat, *section_args)
+            for (stat, _), section_args in zip(sections, plot_args)]
+
+    results = [figure_cache.lookup(key) for key in keys]
+    missing = [idx for idx, result in enumerate(results) if result is None]
+
+    slow = False
+    if missing:
+        start = time.monotonic()
+        first = missing.pop(0)
+        results[first] = figure_cache.plot(sections[first][0], *plot_args[first])
+        slow = time.monotonic() - start > PARALLEL_SECTION_TIME
+
+    workers = min(_report_workers(), len(missing))
+    if workers > 1 and slow:
+        try:
+            rendered = _render_in_processes([(sections[idx][0], plot_args[idx]) for idx in missing],
+                                            workers)
+        except Exception as e:
+            print(f"WARNING: parallel rendering failed ({e.__class__.__name__}: {e}), "
+                  "falling back to the serial rendering ...")
+        else:
+            for idx, result in zip(missing, rendered):
+                results[idx] = figure_cache.store(keys[idx], result, generation)
+
+    for idx in missing:
+        if results[idx] is None:
+            results[idx] = figure_cache.plot(sections[idx][0], *plot_args[idx])
+
+    return [fig for fig, msg in results]
+
 class OverviewReport():
     def __init__(self):
         self.name = "A test report"
@@ -46,74 +132,69 @@ class OverviewReport():
         gpu_isolation_time_to_threshold = matrix_view.table_stats.TableStats.stats_by_name['GPU Isolation time to threshold']
 
         mig7g_40gb_time_to_threshold = matrix_view.table_stats.TableStats.stats_by_name['MIG 7g.40gb time to threshold']
+
         # ---
 
-        settings = dict(common_settings) | dict(
+        multi_gpu_settings = dict(common_settings) | dict(
             pod_count=1,
             gpu_type="full",
             mig_strategy="none",
         )
-
-        graph = multi_gpu_time_to_threshold.do_plot(*set_vars(settings, *args))[0]
-
-        header += [html.H2("Multi-GPU benchmarking: time to threshold")]
-        header += [dcc.Graph(figure=graph)]
-
-        # ---
-
-        settings = dict(common_settings) | dict(
+        gpu_isolation_settings = dict(common_settings) | dict(
             gpu_type="full",
             gpu_count=1,
             mig_strategy="none",
         )
-
-        graph = gpu_isolation_time_to_threshold.do_plot(*set_vars(settings, *args))[0]
-
-        header += [html.H2(["GPU Isolation benchmarking: time to threshold"])]
-        header += [html.P(f"{settings}")]
-        header += [dcc.Graph(figure=graph)]
-
-        # ---
-
-        settings = dict(common_settings) | dict(
+        mig7g_40gb_settings = dict(common_settings) | dict(
             gpu_type="7g.40gb",
             pod_count=1,
             mig_strategy="mixed",
         )
+        mig_single_settings = dict(common_settings) | dict(
+            gpu_type="7g.40gb",
+            mig_strategy="single",
+        )
+        mig_multiple_settings = dict(common_settings) | dict(
+            gpu_type="2g.10gb,3g.20gb",
+            mig_strategy="mixed",
+        )
 
-        graph = mig7g_40gb_time_to_threshold.do_plot(*set_vars(settings, *args))[0]
-
-        header += [html.H2(["Parallel MIG benchmarking: time to threshold"])]
-        header += [html.P(f"{settings}")]
-        header += [dcc.Graph(figure=graph)]
+        graphs = render_sections([
+            (multi_gpu_time_to_threshold, multi_gpu_settings),
+            (gpu_isolation_time_to_threshold, gpu_isolation_settings),
+            (mig7g_40gb_time_to_threshold, mig7g_40gb_settings),
+            (exec_time, mig_single_settings),
+            (exec_time, mig_multiple_settings),
+        ], args)
 
         # ---
 
-        settings = dict(common_settings) | dict(
-            gpu_type="7g.40gb",
-            mig_strategy="single",
-        )
+        header += [html.H2("Multi-GPU benchmarking: time to threshold")]
+        header += [dcc.Graph(figure=graphs[0])]
 
-        graph = exec_time.do_plot(*set_vars(settings, *args))[0]
+        # ---
 
-        header += [html.H2(["Parallel MIG benchmarking, ", html.B("single mode"),": execution time"])]
-        header += [html.P(f"{settings}")]
-        header += [dcc.Graph(figure=graph)]
+        header += [html.H2(["GPU Isolation benchmarking: time to threshold"])]
+        header += [html.P(f"{gpu_isolation_settings}")]
+        header += [dcc.Graph(figure=graphs[1])]
 
         # ---
 
+        header += [html.H2(["Parallel MIG benchmarking: time to threshold"])]
+        header += [html.P(f"{mig7g_40gb_settings}")]
+        header += [dcc.Graph(figure=graphs[2])]
 
-        settings = dict(common_settings) | dict(
-            gpu_type="2g.10gb,3g.20gb",
-            mig_strategy="mixed",
-        )
+        # ---
 
-        graph = exec_time.do_plot(*set_vars(settings, *args))[0]
+        header += [html.H2(["Parallel MIG benchmarking, ", html.B("single mode"),": execution time"])]
+        header += [html.P(f"{mig_single_settings}")]
+        header += [dcc.Graph(figure=graphs[3])]
 
-        header += [html.H2(["Parallel MIG benchmarking, ", html.B("multiple MIG types"),": execution time"])]
-        header += [html.P(f"{settings}")]
-        header += [dcc.Graph(figure=graph)]
+        # ---
 
+        header += [html.H2(["Parallel MIG benchmarking, ", html.B("multiple MIG types"),": execution time"])]
+        header += [html.P(f"{mig_multiple_settings}")]
+        header += [dcc.Graph(figure=graphs[4])]
 
         return None, header
 
@@ -142,12 +223,13 @@ class PrometheusMultiGPUReport():
         header = [html.H1("Multi-GPU Prometheus Metrics: " + self.metric)]
 
         # ---
-        for gpu_count in args[3]["gpu_count"]:
+        all_settings = [dict(common_settings) | dict(gpu_count=gpu_count)
+                        for gpu_count in args[3]["gpu_count"]]
+
+        graphs = render_sections([(prom_overview, settings) for settings in all_settings], args)
 
-            settings = dict(common_settings) | dict(
-                gpu_count=gpu_count,
-            )
-            prom_overview_graph = prom_overview.do_plot(*set_vars(settings, *args))[0]
+        for settings, prom_overview_graph in zip(all_settings, graphs):
+            gpu_count = settings["gpu_count"]
 
             header += [html.H2([f"{gpu_count} GPU"+("s" if int(gpu_count) > 1 else "")])]
             header += [html.P(f"{settings}")]
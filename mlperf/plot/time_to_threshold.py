@@ -1,6 +1,8 @@
 from collections import defaultdict
 import statistics as stats
 
+import numpy as np
+
 import plotly.graph_objs as go
 from dash import html
 
@@ -10,6 +12,10 @@ from common import Matrix
 from matrix_view import COLORS
 from matrix_view import COLORS
 
+from plugins.shared import figure_cache
+from plugins.mlperf import resampling
+from plugins.mlperf import aggregate
+
 # https://plotly.com/python/marker-style/#custom-marker-symbols
 SYMBOLS = [
     "circle",
@@ -20,6 +26,14 @@ SYMBOLS = [
     "hexagram",
 ]
 
+def _gpu_filter(mig_type):
+    """Returns the predicate telling if the runs of a gpu_type are part of the `mig_type` plots."""
+
+    if mig_type:
+        return lambda gpu_type: mig_type in gpu_type
+
+    return lambda gpu_type: gpu_type == "full" or gpu_type.endswith("_1")
+
 class Plot():
     def __init__(self):
         self.name = "Time to threshold"
@@ -31,46 +45,34 @@ class Plot():
     def do_hover(self, meta_value, variables, figure, data, click_info):
         return "nothing"
 
+    @figure_cache.cached
     def do_plot(self, ordered_vars, params, param_lists, variables, cfg):
         fig = go.Figure()
 
         plot_title = f"Time to threshold: (lower is better)"
         y_max = 0
 
-        gpus = defaultdict(dict)
-        for entry in Matrix.all_records(params, param_lists):
-            threshold = float(entry.params.threshold)
-            gpu_name = entry.params.gpu_type
-            gpu_name += " x "+ entry.params.gpu_count + "gpu"
-            gpu_name += " x "+ entry.params.pod_count + "pods"
-            exec_times = []
-
-            def add_plot(an_entry):
-                if not an_entry.results: return
-
-                for log_filename, values in an_entry.results.thresholds.items():
-                    sorted_values = sorted(values, key=lambda x:x[0])
-                    thr = [xy[0] for xy in values]
-                    ts = [xy[1]/1000/60 for xy in values]
-                    if log_filename.startswith("/tmp"):
-                        # log_filename: /tmp/ssd_MIG-GPU-d9322296-54da-ce5a-6330-3ca7707e0c5d.log
-                        mig_name = " #"+log_filename.split("_")[1]
+        for run in aggregate.query(params, param_lists):
+            gpu_name = run.params.gpu_type
+            gpu_name += " x "+ run.params.gpu_count + "gpu"
+            gpu_name += " x "+ run.params.pod_count + "pods"
 
-                    else:
-                        mig_name = ""
-
-                    trace = go.Scatter(x=ts, y=thr,
-                                       name=f"{gpu_name}{mig_name}",
-                                       hoverlabel= {'namelength' :-1},
-                                       showlegend=True,
-                                       mode='markers+lines')
-                    fig.add_trace(trace)
-
-            if entry.is_gathered:
-                for single_entry in entry.results:
-                    add_plot(single_entry)
-            else:
-                add_plot(entry)
+            for log_filename, values in run.results.thresholds.items():
+                thr = values.thr
+                ts = values.ts("min")
+                if log_filename.startswith("/tmp"):
+                    # log_filename: /tmp/ssd_MIG-GPU-d9322296-54da-ce5a-6330-3ca7707e0c5d.log
+                    mig_name = " #"+log_filename.split("_")[1]
+
+                else:
+                    mig_name = ""
+
+                trace = go.Scatter(x=ts, y=thr,
+                                   name=f"{gpu_name}{mig_name}",
+                                   hoverlabel= {'namelength' :-1},
+                                   showlegend=True,
+                                   mode='markers+lines')
+                fig.add_trace(trace)
 
         fig.update_layout(
             title=plot_title, title_x=0.5,
@@ -99,6 +101,7 @@ class MigThresholdOverTime():
     def do_hover(self, meta_value, variables, figure, data, click_info):
         return "nothing"
 
+    @figure_cache.cached
     def do_plot(self, ordered_vars, params, param_lists, variables, cfg):
         fig = go.Figure()
         if self.mig_type:
@@ -108,138 +111,44 @@ class MigThresholdOverTime():
         y_max = 0
         y_min = 1
 
-        gpus = set()
-        entries = []
-        for entry in Matrix.all_records(params, param_lists):
-            threshold = float(entry.params.threshold)
-            gpu_name = entry.params.gpu_type
-            if self.mig_type:
-                if not self.mig_type in gpu_name: continue
-            else:
-                if not (gpu_name == "full" or gpu_name.endswith("_1")): continue
-
-            exec_times = []
-            gpus.add(gpu_name)
-            entries.append(entry)
+        runs = aggregate.query(params, param_lists, gpu_types=_gpu_filter(self.mig_type))
+        gpus = {run.params.gpu_type for run in runs}
 
         gpus_to_plot = defaultdict(list)
-        for entry in entries:
-            def add_plot(an_entry):
-                nonlocal y_min, y_max
-                gpu_name = gpu_full_name = an_entry.params.gpu_type
-                if self.mig_type:
-                    gpu_name = gpu_name.replace("_", " x ")
-                else:
-                    if gpu_name.endswith("_1"): gpu_name = gpu_full_name[:-2]
-                    if gpu_name == "full": gpu_name = "8g.40gb (full)"
-
-                xy = []
-                for log_filename, values in an_entry.results.thresholds.items():
-                    if not values: continue
-                    sorted_values = sorted(values, key=lambda x:x[0])
-                    thr = [xy[0] for xy in values]
-
-                    y_min = min([y_min]+thr)
-                    y_max = max([y_max]+thr)
-                    ts = [xy[1]/1000/60/60 for xy in values]
-
-                    gpus_to_plot[(gpu_name, gpu_full_name)].append([ts, thr])
-            if entry.is_gathered:
-                for single_entry in entry.results:
-                    add_plot(single_entry)
+        for run in runs:
+            gpu_name = gpu_full_name = run.params.gpu_type
+            if self.mig_type:
+                gpu_name = gpu_name.replace("_", " x ")
             else:
-                add_plot(entry)
-
-        def do_complete_ts(all_thr, thr, ts):
-            prev_pt = thr[0], ts[0]
-            if not thr or not ts: import pdb;pdb.set_trace()
-            next_pt = thr[1], ts[1]
-
-            current_idx = 0
-
-            complete_ts = []
-
-            for a_thr in all_thr:
-                if a_thr < thr[0]:
-                    # we're before the beginning
-                    complete_ts.append(None)
-                    continue
-
-                while a_thr > next_pt[0] and current_idx != len(thr):
-                    # we're above the current range
-                    # go to the next one
-
-                    current_idx += 1
-                    if current_idx == len(thr): break
+                if gpu_name.endswith("_1"): gpu_name = gpu_full_name[:-2]
+                if gpu_name == "full": gpu_name = "8g.40gb (full)"
 
-                    prev_pt = next_pt[:]
-                    next_pt = thr[current_idx], ts[current_idx]
+            for log_filename, values in run.curves:
+                thr = values.thr
 
-                if current_idx == len(thr):
-                    # we're above the full range
-                    complete_ts.append(None)
-                    continue
+                y_min = min(y_min, thr.min())
+                y_max = max(y_max, thr.max())
+                ts = values.ts("hr")
 
-                # now we have the right range. Do a linear interpolation
-
-                if a_thr == next_pt[0]:
-                    a_ts = next_pt[1]
-                else:
-                    a_ts = prev_pt[1] + (a_thr-prev_pt[0])*(next_pt[1]-prev_pt[1])/(next_pt[0]-prev_pt[0])
-
-                complete_ts.append(a_ts)
-
-            return complete_ts
+                gpus_to_plot[(gpu_name, gpu_full_name)].append([ts, thr])
 
         for [gpu_name, gpu_full_name], xy_values in gpus_to_plot.items():
-            all_thr = set()
-            for ts, thr in xy_values:
-                all_thr.update(thr)
-            all_thr = sorted(all_thr)
+            # the time to reach each of the thresholds of the runs
+            all_thr, all_ts = resampling.resample([[thr, ts] for ts, thr in xy_values])
+            ts_bands = resampling.bands(all_ts)
 
-            all_ts_values = defaultdict(list)
+            # the last threshold is dropped when only one run reached it
+            keep = np.ones(len(all_thr), dtype=bool)
+            if len(all_thr) and ts_bands["count"][-1] == 1:
+                keep[-1] = False
 
-            for ts, thr in xy_values:
-                all_ts = do_complete_ts(all_thr, thr, ts)
+            mean = ts_bands["mean"][keep]
+            y_err = np.where(ts_bands["count"][keep] > 2, ts_bands["stdev"][keep], 0)
 
-                trace = go.Scatter(x=thr, y=ts,
-                               name=gpu_name + " before",
-                               hoverlabel= {'namelength' :-1},
-                               showlegend=True,
-
-                               mode='lines+markers',
-                               )
-                #fig.add_trace(trace)
-                trace = go.Scatter(x=all_thr, y=all_ts,
-                               name=gpu_name + " after",
-                               hoverlabel= {'namelength' :-1},
-                               showlegend=True,
-                               mode='lines+markers',
-                               )
-                #fig.add_trace(trace)
-
-                for a_ts, a_thr in zip(all_ts, all_thr):
-                    all_ts_values[a_thr].append(a_ts)
-
-            y = []
-            y_err_upper = []
-            y_err_lower = []
-            x = []
-
-            for thr, ts in all_ts_values.items():
-                ts_values = [t for t in ts if t is not None]
-                if len(ts_values) == 1 and thr == list(all_ts_values)[-1]: continue
-
-                x.append(thr)
-                y.append(stats.mean(ts_values) if ts_values else None)
-                y_err = stats.stdev(ts_values) if len(ts_values) > 2 else None
-                if y[-1] is None:
-                    y_err_upper.append(None)
-                    y_err_lower.append(None)
-                    continue
-                if y_err is None: y_err = 0
-                y_err_upper.append(y[-1]+y_err)
-                y_err_lower.append(y[-1]-y_err)
+            x = all_thr[keep].tolist()
+            y = [None if np.isnan(value) else value for value in mean.tolist()]
+            y_err_upper = [None if np.isnan(value) else value for value in (mean + y_err).tolist()]
+            y_err_lower = [None if np.isnan(value) else value for value in (mean - y_err).tolist()]
 
             trace = go.Scatter(x=x, y=y,
                                name=(gpu_name + " (mean)").replace(") (", ", "),
@@ -304,6 +213,7 @@ class MigTimeToThreshold():
     def do_hover(self, meta_value, variables, figure, data, click_info):
         return "nothing"
 
+    @figure_cache.cached
     def do_plot(self, ordered_vars, params, param_lists, variables, cfg):
         fig = go.Figure()
         plot_title = "MIG"
@@ -322,68 +232,39 @@ class MigTimeToThreshold():
         else:
             plot_title += f"Time to {threshold} threshold"
 
-        # remove unwanted entries from the `all_records` list
-        entries = []
-        for entry in Matrix.all_records(params, param_lists):
-            gpu_name = entry.params.gpu_type
+        plot_values = defaultdict(list)
+        x_names = {}
+        for run in aggregate.query(params, param_lists, gpu_types=_gpu_filter(self.mig_type)):
+            gpu_name = gpu_full_name = run.params.gpu_type
             if self.mig_type:
-                if not self.mig_type in gpu_name: continue
+                gpu_name = f"{run.params.gpu_type} x {run.params.gpu_count}"
             else:
-                if not (gpu_name == "full" or gpu_name.endswith("_1")): continue
+                if gpu_name.endswith("_1"): gpu_name = gpu_full_name[:-2]
 
-            entries.append(entry)
+                if gpu_name == "full":
+                    if self.multi_gpu:
+                        gpu_name = f"{run.params.gpu_count} GPU" + ('s' if int(run.params.gpu_count) > 1 else '')
+                        if self.full_gpu_isolation:
+                            gpu_name += f"x {run.params.pod_count} Pods"
+                    else:
+                        gpu_name = "8g.40gb (full)"
 
-        plot_values = defaultdict(list)
-        x_names = {}
-        for entry in entries:
-            def add_plot(an_entry):
-                gpu_name = gpu_full_name = an_entry.params.gpu_type
-                if self.mig_type:
-                    gpu_name = f"{an_entry.params.gpu_type} x {an_entry.params.gpu_count}"
-                else:
-                    if gpu_name.endswith("_1"): gpu_name = gpu_full_name[:-2]
-
-                    if gpu_name == "full":
-                        if self.multi_gpu:
-                            gpu_name = f"{an_entry.params.gpu_count} GPU" + ('s' if int(an_entry.params.gpu_count) > 1 else '')
-                            if self.full_gpu_isolation:
-                                gpu_name += f"x {an_entry.params.pod_count} Pods"
-                        else:
-                            gpu_name = "8g.40gb (full)"
-
-                if self.multi_gpu:
-                    x_value = int(an_entry.params.pod_count) if self.full_gpu_isolation \
-                        else int(an_entry.params.gpu_count)
-
-                elif self.mig_type:
-                    x_value = int(gpu_name.split(" ")[-1])
-                else:
-                    x_value = int(gpu_name.split("g")[0])
+            if self.multi_gpu:
+                x_value = int(run.params.pod_count) if self.full_gpu_isolation \
+                    else int(run.params.gpu_count)
 
-                x_names[x_value] = gpu_name
+            elif self.mig_type:
+                x_value = int(gpu_name.split(" ")[-1])
+            else:
+                x_value = int(gpu_name.split("g")[0])
 
-                if not an_entry.results:
-                    print("no results in", an_entry.location)
-                    return
+            x_names[x_value] = gpu_name
 
-                if self.speed:
-                    for mig_name, speed in an_entry.results.avg_sample_sec.items():
-                        plot_values[x_value].append(speed)
-                else:
-                    for log_filename, values in an_entry.results.thresholds.items():
-                        ts = [xy[1]/1000/60 for xy in values]
-                        thr = [xy[0] for xy in values]
-                        if not ts: continue
-                        # should be cfg value ...
-                        #if thr[-1] < 0.22: continue
-
-                        plot_values[x_value].append(ts[-1])
-
-            if entry.is_gathered:
-                for single_entry in entry.results:
-                    add_plot(single_entry)
-            else:
-                add_plot(entry)
+            # should be cfg value ...
+            #if values.thr[-1] < 0.22: continue
+            run_values = run.speeds if self.speed else run.final_times
+            if run_values:
+                plot_values[x_value] += run_values
 
         y_means = [stats.mean(y_values) for y_values in plot_values.values()]
         if not y_means:
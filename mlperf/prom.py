@@ -0,0 +1,130 @@
+"""
+Lazy loader of the Prometheus metrics saved by run_ssd.py in the
+metrics/prom_*.json files.
+"""
+
+import os
+import glob
+import json
+import functools
+import collections.abc
+
+import numpy as np
+
+from plugins.mlperf import downsample
+
+PROM_CACHE_SIZE = int(os.environ.get("MATBENCH_MLPERF_PROM_CACHE_SIZE", 64))
+# width (in pixels) of the plots of the series, reduced to one point per pixel. 0 for the full resolution
+PROM_PLOT_WIDTH = int(os.environ.get("MATBENCH_MLPERF_PROM_PLOT_WIDTH", 1500))
+
+class PromSeries():
+    """
+    Values of one metric for one Prometheus group, stored as two
+    contiguous float arrays: the timestamps and the values.
+
+    As a sequence, the series is the plotting view of the values:
+    [ts, value] pairs reduced to PROM_PLOT_WIDTH points, which keep the
+    minimum and the maximum of each group of samples.
+    """
+
+    __slots__ = ("ts", "values", "_plot_views")
+
+    def __init__(self, ts, values):
+        self.ts = ts
+        self.values = values
+
+        self._plot_views = {} # width -> (ts, values) arrays
+
+    def plot_view(self, width=PROM_PLOT_WIDTH):
+        """(ts, values) arrays of the series plotted `width` pixels wide, 0 for the full resolution."""
+
+        if not width:
+            return self.ts, self.values
+
+        if width not in self._plot_views:
+            self._plot_views[width] = downsample.lttb(self.ts, self.values, width, extremes=True)
+
+        return self._plot_views[width]
+
+    def __len__(self):
+        return len(self.plot_view()[0])
+
+    def __iter__(self):
+        ts, values = self.plot_view()
+
+        return (list(ts_value) for ts_value in zip(ts.tolist(), values.tolist()))
+
+    def __getitem__(self, idx):
+        ts, values = self.plot_view()
+
+        return [ts[idx], values[idx]]
+
+
+@functools.lru_cache(maxsize=PROM_CACHE_SIZE)
+def _load_metric(fname, mtime_ns, pod_names):
+    """
+    Decodes the `fname` metric file into its {prom_group: PromSeries}
+    dict. `mtime_ns` is only part of the cache key.
+    """
+
+    with open(fname) as f:
+        data = json.load(f)
+
+    groups = {}
+    for result_per_gpu in data['result']:
+        try: exported_pod = result_per_gpu["metric"]["exported_pod"]
+        except KeyError: continue
+
+        if exported_pod not in pod_names:
+            continue
+
+        if 'gpu' in result_per_gpu['metric']:
+            gpu = result_per_gpu['metric']['gpu']
+            prom_group = f"{exported_pod} | gpu #{gpu} "
+        else:
+            prom_group = "container"
+
+        ts_values = np.array(result_per_gpu['values'], dtype=np.float64).reshape(-1, 2)
+
+        groups[prom_group] = PromSeries(np.ascontiguousarray(ts_values[:, 0]),
+                                        np.ascontiguousarray(ts_values[:, 1]))
+
+    return groups
+
+
+class PromMetrics(collections.abc.Mapping):
+    """
+    {metric: {prom_group: PromSeries}} mapping of the metrics of one
+    result directory.
+
+    Only the metric file names are indexed when the directory is
+    imported. A metric is decoded the first time it is accessed, and
+    kept in an LRU cache of PROM_CACHE_SIZE metrics (shared by all the
+    result directories).
+    """
+
+    def __init__(self, dirname, pod_names):
+        self.pod_names = frozenset(pod_names)
+        self.files = {}
+
+        for fname in sorted(glob.glob(f"{dirname}/metrics/prom_*.json")):
+            metric = os.path.basename(fname)[len("prom_"):-len(".json")]
+            self.files[metric] = fname
+
+    def __getitem__(self, metric):
+        try:
+            fname = self.files[metric]
+        except KeyError:
+            # unknown metrics have no values
+            return {}
+
+        return _load_metric(fname, os.stat(fname).st_mtime_ns, self.pod_names)
+
+    def __contains__(self, metric):
+        return metric in self.files
+
+    def __iter__(self):
+        return iter(self.files)
+
+    def __len__(self):
+        return len(self.files)
@@ -0,0 +1,97 @@
+"""
+Resampling of (x, y) series, like the time-to-threshold series of
+several runs, on a shared grid of x values, so that the runs can be
+aggregated point by point.
+"""
+
+import warnings
+
+import numpy as np
+
+def resample(series, grid=None):
+    """
+    Interpolates the list of (x, y) `series` on the sorted `grid` (by
+    default, the sorted union of the x values of the series) in one
+    pass.
+
+    The y value at a grid point is linearly interpolated on the first
+    segment of the series reaching it: for a threshold series, it's the
+    time when the threshold was first reached.
+
+    Returns the grid and a (series x grid) array of the values, NaN
+    where the grid point is out of the range of the series (before its
+    first x value, or above its highest x value).
+    """
+
+    series = [(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+              for x, y in series if len(x)]
+
+    if grid is None:
+        grid = np.unique(np.concatenate([x for x, _ in series])) if series else np.empty(0)
+    grid = np.asarray(grid, dtype=np.float64)
+
+    values = np.full((len(series), len(grid)), np.nan)
+    if not series or not len(grid):
+        return grid, values
+
+    # a single point is only reached at its own x value
+    series = [(x, y) if len(x) > 1 else (np.repeat(x, 2), np.repeat(y, 2)) for x, y in series]
+
+    length = max(len(x) for x, _ in series)
+    X = np.full((len(series), length), np.nan)
+    Y = np.full((len(series), length), np.nan)
+    lengths = np.array([len(x) for x, _ in series])
+    for row, (x, y) in enumerate(series):
+        X[row, :len(x)] = x
+        Y[row, :len(y)] = y
+
+    # the comparisons are done on the integer ranks of the x values in the grid:
+    # x >= grid[j] <=> rank(x) > j
+    ranks = np.searchsorted(grid, np.where(np.isnan(X), np.inf, X), side="right")
+
+    # running max of the ranks of the segment ends (x[1:]), so that
+    # the first segment reaching grid[j] is found with a binary search
+    reached = np.maximum.accumulate(ranks[:, 1:], axis=1)
+
+    # all the rows are searched at once, with an offset per row
+    # keeping them sorted in the flattened array. The padding ranks
+    # are len(grid), a grid point only found there isn't reached.
+    rows = np.arange(len(series))[:, None]
+    row_offsets = rows * (len(grid) + 1)
+    targets = np.arange(1, len(grid) + 1)[None, :] + row_offsets
+    position = np.searchsorted((reached + row_offsets).ravel(), targets) - rows * (length - 1)
+    segment_end = position + 1
+
+    in_range = (segment_end < lengths[:, None]) & (grid[None, :] >= X[:, :1])
+
+    end = np.where(in_range, segment_end, 1)
+    x_prev, y_prev = X[rows, end - 1], Y[rows, end - 1]
+    x_next, y_next = X[rows, end], Y[rows, end]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        interpolated = y_prev + (grid - x_prev) * (y_next - y_prev) / (x_next - x_prev)
+    interpolated = np.where(x_next == grid, y_next, interpolated)
+
+    values[in_range] = interpolated[in_range]
+
+    return grid, values
+
+def bands(values):
+    """
+    Computes the statistics of the columns of the (series x grid)
+    `values` array, ignoring the NaN values. Returns a dict of arrays
+    with one value per grid point: count, mean and stdev (NaN without
+    enough values).
+    """
+
+    count = np.count_nonzero(~np.isnan(values), axis=0)
+
+    with warnings.catch_warnings():
+        # columns without enough values
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+
+        return dict(
+            count=count,
+            mean=np.nanmean(values, axis=0),
+            stdev=np.nanstd(values, axis=0, ddof=1),
+        )
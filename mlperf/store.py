@@ -4,8 +4,17 @@ import store
 import store.simple
 from store.simple import *
 import glob
-import json
-from collections import defaultdict
+import os
+import time
+import pathlib
+import concurrent.futures
+
+from plugins.mlperf import mllog
+from plugins.mlperf import cache as results_cache
+from plugins.mlperf import prom
+from plugins.mlperf import watch
+from plugins.mlperf import aggregate
+from plugins.shared import figure_cache
 
 def mlperf_rewrite_settings(params_dict):
     params_dict.pop("opts", True)
@@ -25,101 +34,171 @@ def mlperf_rewrite_settings(params_dict):
 store.custom_rewrite_settings = mlperf_rewrite_settings
 
 def mlperf_parse_prom_gpu_metrics(dirname, results):
-    return
-    prom = results.prom = defaultdict(lambda: defaultdict(dict))
-    for res_file in glob.glob(f"{dirname}/metrics/prom_*.json"):
-        with open(res_file) as f:
-            data = json.load(f)
+    # the metric files are only indexed here,
+    # they are decoded when a plot accesses them
+    results.prom = prom.PromMetrics(dirname, results.pod_names)
 
-        for result_per_gpu in data['result']:
-            try: exported_pod = result_per_gpu["metric"]["exported_pod"]
-            except KeyError: continue
 
-            if exported_pod not in results.pod_names:
-                continue
+# log file path -> mllog.PodLogParser checkpoint of the last parse
+_POD_LOGS_CHECKPOINTS = {}
 
-            if 'gpu' in result_per_gpu['metric']:
-                gpu = result_per_gpu['metric']['gpu']
-                prom_group = f"{exported_pod} | gpu #{gpu} "
-            else:
-                prom_group = "container"
+# log file path -> (parser, error) of the files which failed in the import workers
+_POD_LOGS_FAILED = {}
+
+# dirname -> (results, cache key) found valid in the cache during the prefetch
+_CACHED_RESULTS = {}
+
+# dirname -> results of the directories imported, refreshed by the watch mode
+_RESULTS_BY_DIR = {}
+
+# watch.Watcher of the results directory, in watch mode
+_WATCHER = None
+
+# in watch mode, a pod log modified more recently (in seconds) is still being written
+LIVE_LOG_DELAY = 60
+
+def _scan_logs():
+    # 'mmap' only decodes the log lines with a marker, 'stream' decodes all of them
+    return os.environ.get("MATBENCH_MLPERF_LOG_SCANNER", "mmap") == "mmap"
+
+def _import_workers():
+    workers = int(os.environ.get("MATBENCH_MLPERF_IMPORT_WORKERS", 1))
+
+    return workers if workers > 0 else os.cpu_count()
+
+def _watch_enabled():
+    return os.environ.get("MATBENCH_MLPERF_WATCH", "0") == "1"
+
+def _parse_log_file(log_file, parser=None, final=None):
+    """
+    Parses `log_file`, or resumes the parsing of its `parser` checkpoint.
+    Returns the parser and the parsing error, if any.
+
+    `final` tells if a last line without its newline is complete. By
+    default, it is unless the file is still being written (watch mode).
+    """
+
+    try:
+        with open(log_file, "rb") as log_f:
+            stat = os.fstat(log_f.fileno())
+            if parser is None or not parser.can_resume(stat, log_f):
+                parser = mllog.PodLogParser(log_file, stat)
+
+            if final is None:
+                final = not (_watch_enabled() and time.time() - stat.st_mtime < LIVE_LOG_DELAY)
 
-            metric = result_per_gpu['metric']['__name__']
-            values = [[ts, float(val)] for ts, val in result_per_gpu['values']]
+            if parser.offset != stat.st_size:
+                parser.parse(log_f, final=final, scan=_scan_logs())
+    except Exception as e:
+        return parser, e
 
-            prom[metric][prom_group] = values
-            #print(metric, ":", len(values))
-        pass
+    return parser, None
 
+def _parse_pod_logs(dirname, results, log_file, final=None):
+    log_file = os.path.abspath(log_file)
+    parser, error = _POD_LOGS_FAILED.pop(log_file, None) or \
+        _parse_log_file(log_file, _POD_LOGS_CHECKPOINTS.pop(log_file, None), final)
 
-def _parse_pod_logs(dirname, results, pod_logs_f):
-    has_thr020 = {}
-    prev_thr = {}
-    #start_ts = None
-    start_timestamps = {}
+    if parser is not None:
+        parser.update_results(results)
 
-    for line in pod_logs_f.readlines():
-        if "result=" in line:
-            results.exec_time = int(line.split('=')[-1].strip())/60
+    if error is not None:
+        raise error
 
-        if "avg. samples / sec" in line:
-            gpu_name = "single" if not line.startswith("/tmp") else \
-                line.split(":")[0]
+    _POD_LOGS_CHECKPOINTS[log_file] = parser
 
-            results.avg_sample_sec[gpu_name] = float(line.split("avg. samples / sec: ")[-1].strip())
+def _logs_complete(dirname):
+    """Tells if the last parse of the pod logs of `dirname` reached the end of the files."""
 
-        if '"key": "eval_accuracy"' in line or '"key": "init_start"' in line:
-            MLLOG_PREFIX = ":::MLLOG "
-            if line.startswith(MLLOG_PREFIX):
-                gpu_name = "full_gpu"
+    dirname = os.path.abspath(dirname)
+
+    return all(parser.complete for log_file, parser in _POD_LOGS_CHECKPOINTS.items()
+               if os.path.dirname(log_file) == dirname)
+
+def _prefetch_pod_logs(results_dir, workers):
+    """
+    Parses all the pod log files of `results_dir` in a pool of
+    `workers` processes.
+
+    The parsers are stored as checkpoints, so that
+    `mlperf_parse_ssd_results` only has to merge them, in the order of
+    the log files.
+    """
+
+    log_files = []
+    for log_file in sorted(glob.glob(f"{results_dir}/**/run-*.log", recursive=True)):
+        dirname = os.path.dirname(os.path.abspath(log_file))
+        if dirname not in _CACHED_RESULTS:
+            _CACHED_RESULTS[dirname] = _load_cached_results(dirname)
+
+        if _CACHED_RESULTS[dirname][0] is not None:
+            continue
+
+        log_files.append(os.path.abspath(log_file))
+
+    if not log_files:
+        return
+
+    checkpoints = [_POD_LOGS_CHECKPOINTS.get(log_file) for log_file in log_files]
+    chunksize = max(1, len(log_files) // (workers * 4))
+
+    print(f"INFO: parsing {len(log_files)} pod log files with {workers} workers ...")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        parsed = executor.map(_parse_log_file, log_files, checkpoints, chunksize=chunksize)
+
+        for log_file, (parser, error) in zip(log_files, parsed):
+            if error is None:
+                _POD_LOGS_CHECKPOINTS[log_file] = parser
             else:
-                gpu_name = line.partition(MLLOG_PREFIX)[0]
-
-            json_content = json.loads(line.partition(MLLOG_PREFIX)[-1])
-            line_ts = json_content['time_ms']
-
-            if json_content['key'] == "eval_accuracy":
-                if gpu_name in has_thr020: continue
-                line_threshold = json_content['value']
-                if line_threshold < prev_thr.get(gpu_name, 0): continue
-                prev_thr[gpu_name] = line_threshold
-                try:
-                    threadhold_time = line_ts - start_timestamps[gpu_name]
-                    results.thresholds[gpu_name].append([line_threshold, threadhold_time])
-                    if line_threshold > 0.2: has_thr020[gpu_name] = True
-                except KeyError:
-                    raise Exception(f"gpu_name={gpu_name} didn't start in {pod_logs_f.name}")
-
-            elif json_content['key'] == "init_start":
-                if gpu_name in start_timestamps:
-                    if gpu_name != "full_gpu":
-                        raise Exception(f"Duplicated gpu_name={gpu_name} found in {pod_logs_f.name}")
-                    else:
-                        # running with in multi-GPU mode,
-                        # keep only the 1st timestamp
-                        continue
-
-                start_timestamps[gpu_name] = line_ts
-
-                results.thresholds[gpu_name] = []
-
-def mlperf_parse_ssd_results(dirname, import_settings):
+                _POD_LOGS_CHECKPOINTS.pop(log_file, None)
+                _POD_LOGS_FAILED[log_file] = parser, error
+
+def _load_cached_results(dirname):
+    """
+    Returns the cached results of `dirname` if they are still valid, and
+    the cache key of its current files.
+    """
+
+    if not results_cache.enabled():
+        return None, None
+
+    dirname = os.path.abspath(dirname)
+    if dirname in _CACHED_RESULTS:
+        return _CACHED_RESULTS.pop(dirname)
+
+    key = results_cache.key(dirname)
+    cached = results_cache.read(dirname)
+    if cached is None or cached["key"] != key:
+        return None, key
+
+    try:
+        return mllog.results_from_dict(cached["results"]), key
+    except Exception as e:
+        print(f"WARNING: invalid results cache in '{dirname}': {e.__class__.__name__}: {e}")
+        return None, key
+
+def _save_cached_results(dirname, key, results):
+    if not results_cache.enabled():
+        return
+
+    results_cache.write(os.path.abspath(dirname), key, mllog.results_to_dict(results))
+
+def mlperf_parse_ssd_results(dirname, import_settings, final=None):
     results = types.SimpleNamespace()
     results.pod_names = set()
     results.thresholds = {}
     results.avg_sample_sec = {}
 
     has_logs = False
-    for log_file in glob.glob(f"{dirname}/run-*.log"):
+    for log_file in sorted(glob.glob(f"{dirname}/run-*.log")):
         pod_name = log_file.rpartition("/")[-1][:-4]
         results.pod_names.add(pod_name)
-        with open(log_file) as log_f:
-            try:
-                _parse_pod_logs(dirname, results, log_f)
-                has_logs = True
-            except Exception as e:
-                print(f"WARNING: failed to parse {log_file}: {e}")
-                #raise e
+        try:
+            _parse_pod_logs(dirname, results, log_file, final)
+            has_logs = True
+        except Exception as e:
+            print(f"WARNING: failed to parse {log_file}: {e}")
+            #raise e
 
     if not has_logs:
         print(f"WARNING: could not find pod log files in '{dirname}', skipping ...")
@@ -131,7 +210,13 @@ def mlperf_parse_ssd_results(dirname, import_settings):
 def mlperf_parse_results(dirname, import_settings):
     benchmark = import_settings.get("benchmark")
     if benchmark == "ssd":
-        results = mlperf_parse_ssd_results(dirname, import_settings)
+        results, cache_key = _load_cached_results(dirname)
+        if results is None:
+            results = mlperf_parse_ssd_results(dirname, import_settings)
+            # the last line of a log still being written isn't parsed yet,
+            # the cache would keep it missing until the log changes again
+            if results is not None and _logs_complete(dirname):
+                _save_cached_results(dirname, cache_key, results)
     else:
         print(f"WARNING: benchmark '{benchmark}' not currently parsed. Skipping {dirname} ...")
         results = None
@@ -142,6 +227,114 @@ def mlperf_parse_results(dirname, import_settings):
     if not store.benchmark_mode:
         mlperf_parse_prom_gpu_metrics(dirname, results)
 
+    _RESULTS_BY_DIR[os.path.abspath(dirname)] = results
+
     return [({}, results)]
 
 store.simple.custom_parse_results = mlperf_parse_results
+
+
+def _read_settings(dirname):
+    import_settings = {}
+    with open(os.path.join(dirname, "settings")) as f:
+        for line in f.readlines():
+            key, found, value = line.strip().partition("=")
+            if found:
+                import_settings[key] = value
+
+    return store.custom_rewrite_settings(import_settings)
+
+def _duplicated_directory(import_key, old_location, new_location):
+    print(f"WARNING: duplicated results key in '{new_location}'")
+    print(f"WARNING:   old: {old_location}")
+    print(f"WARNING:   new: {new_location}")
+
+def _refresh_results(dirname, results, final=None):
+    """
+    Parses the lines appended to the pod logs of `dirname` since the
+    last parse, and updates `results` in place.
+    """
+
+    refreshed = mlperf_parse_ssd_results(dirname, {}, final=final)
+    if refreshed is None:
+        return
+
+    # the logs are parsed above without the lock, only the update is serialized with the plots
+    with watch.RESULTS_LOCK:
+        vars(results).update(vars(refreshed))
+
+        if not store.benchmark_mode:
+            mlperf_parse_prom_gpu_metrics(dirname, results)
+
+        aggregate.invalidate()
+        figure_cache.invalidate()
+
+def _import_new_directory(dirname):
+    if not os.path.exists(os.path.join(dirname, "settings")) \
+       or not glob.glob(f"{dirname}/run-*.log"):
+        # not a result directory, or not one yet
+        return
+
+    print(f"INFO: importing the new results of '{dirname}' ...")
+    import_settings = _read_settings(dirname)
+    with watch.RESULTS_LOCK:
+        for extra_settings, results in mlperf_parse_results(dirname, import_settings):
+            if not results:
+                continue
+
+            store.add_to_matrix(import_settings | extra_settings, pathlib.Path(dirname), results,
+                                _duplicated_directory)
+
+        aggregate.invalidate()
+        figure_cache.invalidate()
+
+def _on_watch_update(dirname, closed):
+    results = _RESULTS_BY_DIR.get(dirname)
+    if results is None:
+        _import_new_directory(dirname)
+    else:
+        _refresh_results(dirname, results, final=True if closed else None)
+
+def _stop_watcher():
+    global _WATCHER
+
+    if _WATCHER is not None:
+        _WATCHER.stop()
+        _WATCHER = None
+
+def _start_watcher(results_dir):
+    global _WATCHER
+
+    print(f"INFO: watching '{results_dir}' for new results ...")
+    _WATCHER = watch.Watcher(results_dir, _on_watch_update)
+    _WATCHER.start()
+
+
+def parse_data(results_dir):
+    # the watcher of the previous results would import into the new ones
+    _stop_watcher()
+
+    _RESULTS_BY_DIR.clear()
+    figure_cache.invalidate()
+
+    workers = _import_workers()
+    if workers > 1:
+        try:
+            _prefetch_pod_logs(results_dir, workers)
+        except Exception as e:
+            print(f"WARNING: parallel import failed ({e.__class__.__name__}: {e}), "
+                  "falling back to the serial import ...")
+
+    try:
+        parsed = store.simple.parse_data(results_dir)
+    finally:
+        _POD_LOGS_FAILED.clear()
+        _CACHED_RESULTS.clear()
+
+    # the runs are indexed from the new matrix entries
+    aggregate.invalidate()
+
+    if _watch_enabled():
+        _start_watcher(results_dir)
+
+    return parsed
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# the tests import the plugins as `plugins.*`, like MatrixBenchmarking
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "shared"))
+from plugins_package import import_plugins_package
+
+import_plugins_package()
@@ -0,0 +1,118 @@
+"""
+The memory-mapped scanner (iter_marked_lines) must give the same
+results as the streaming parser (iter_log_lines).
+"""
+
+import os
+
+import pytest
+
+from plugins.mlperf import mllog
+
+MARKERS = [marker.decode() for marker in mllog.LINE_MARKERS]
+
+LOG_LINES = [
+    "starting the training",
+    ':::MLLOG {"key": "init_start", "time_ms": 1000}',
+    "gpu1 :::MLLOG {\"key\": \"init_start\", \"time_ms\": 1500}",
+    "iteration 10, loss 4.2",
+    ':::MLLOG {"key": "eval_accuracy", "value": 0.05, "time_ms": 61000}',
+    "gpu1 :::MLLOG {\"key\": \"eval_accuracy\", \"value\": 0.08, \"time_ms\": 91500}",
+    "avg. samples / sec: 123.45",
+    "gpu1:avg. samples / sec: 99.5",
+    ':::MLLOG {"key": "eval_accuracy", "value": 0.12, "time_ms": 121000}',
+    "gpu1 :::MLLOG {\"key\": \"eval_accuracy\", \"value\": 0.21, \"time_ms\": 181500}",
+    "iteration 20, loss 3.1",
+    "result=3600",
+]
+
+NEWLINES = {
+    "lf": "\n",
+    "crlf": "\r\n",
+    "cr": "\r",
+}
+
+def write_log(tmp_path, content):
+    log_file = tmp_path / "run-test.log"
+    log_file.write_bytes(content.encode())
+
+    return log_file
+
+def log_content(newline, trailing_newline=True):
+    return newline.join(LOG_LINES) + (newline if trailing_newline else "")
+
+def marked(lines):
+    return [(offset, line) for offset, line in lines if any(marker in line for marker in MARKERS)]
+
+def parse(log_file, scan, final=True, parser=None):
+    with open(log_file, "rb") as log_f:
+        if parser is None:
+            parser = mllog.PodLogParser(str(log_file), os.fstat(log_f.fileno()))
+        parser.parse(log_f, final=final, scan=scan)
+
+    return parser
+
+def parser_state(parser):
+    return dict(
+        offset=parser.offset,
+        complete=parser.complete,
+        exec_time=parser.exec_time,
+        avg_sample_sec=parser.avg_sample_sec,
+        thresholds={gpu_name: (values.thr.tolist(), values.ts_ms.tolist())
+                    for gpu_name, values in parser.thresholds.items()},
+    )
+
+@pytest.mark.parametrize("newline", NEWLINES.values(), ids=NEWLINES.keys())
+@pytest.mark.parametrize("trailing_newline", [True, False], ids=["newline", "no-newline"])
+@pytest.mark.parametrize("final", [True, False], ids=["final", "live"])
+def test_marked_lines(tmp_path, newline, trailing_newline, final):
+    log_file = write_log(tmp_path, log_content(newline, trailing_newline))
+
+    with open(log_file, "rb") as log_f:
+        streamed = list(mllog.iter_log_lines(log_f, final=final))
+        scanned = list(mllog.iter_marked_lines(log_f, final=final))
+
+    assert marked(scanned) == marked(streamed)
+
+    # the lines without marker are consumed all the same
+    last_offset = lambda lines: lines[-1][0] if lines else 0
+    assert last_offset(scanned) == last_offset(streamed)
+
+@pytest.mark.parametrize("newline", NEWLINES.values(), ids=NEWLINES.keys())
+@pytest.mark.parametrize("trailing_newline", [True, False], ids=["newline", "no-newline"])
+def test_parse_results(tmp_path, newline, trailing_newline):
+    log_file = write_log(tmp_path, log_content(newline, trailing_newline))
+
+    streamed = parser_state(parse(log_file, scan=False))
+    scanned = parser_state(parse(log_file, scan=True))
+
+    assert scanned == streamed
+    assert streamed["exec_time"] == 60
+    assert streamed["thresholds"]["full_gpu"] == ([0.05, 0.12], [60000, 120000])
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"], ids=["lf", "crlf"])
+@pytest.mark.parametrize("scan", [True, False], ids=["scan", "stream"])
+def test_resume(tmp_path, newline, scan):
+    content = log_content(newline)
+    full = parser_state(parse(write_log(tmp_path, content), scan=False))
+
+    # the log is written in two parts, cut at every position
+    for cut in range(1, len(content)):
+        log_file = write_log(tmp_path, content[:cut])
+        parser = parse(log_file, scan=scan, final=False)
+
+        # a line without its newline yet is left for the next parse
+        assert parser.offset == content.rfind("\n", 0, cut) + 1
+
+        log_file.write_bytes(content.encode())
+        with open(log_file, "rb") as log_f:
+            assert parser.can_resume(log_file.stat(), log_f)
+
+        assert parser_state(parse(log_file, scan=scan, parser=parser)) == full
+
+def test_empty_log(tmp_path):
+    log_file = write_log(tmp_path, "")
+
+    with open(log_file, "rb") as log_f:
+        assert list(mllog.iter_marked_lines(log_f)) == []
+        assert list(mllog.iter_log_lines(log_f)) == []
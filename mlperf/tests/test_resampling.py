@@ -0,0 +1,119 @@
+"""
+The NumPy resampling must give the same values as the former
+point-by-point interpolation of MigThresholdOverTime.
+"""
+
+import random
+import statistics
+
+import numpy as np
+import pytest
+
+from plugins.mlperf import resampling
+
+def do_complete_ts(all_thr, thr, ts):
+    # former implementation, nested in MigThresholdOverTime.do_plot
+    prev_pt = thr[0], ts[0]
+    next_pt = thr[1], ts[1]
+
+    current_idx = 0
+
+    complete_ts = []
+
+    for a_thr in all_thr:
+        if a_thr < thr[0]:
+            # we're before the beginning
+            complete_ts.append(None)
+            continue
+
+        while a_thr > next_pt[0] and current_idx != len(thr):
+            # we're above the current range
+            # go to the next one
+
+            current_idx += 1
+            if current_idx == len(thr): break
+
+            prev_pt = next_pt[:]
+            next_pt = thr[current_idx], ts[current_idx]
+
+        if current_idx == len(thr):
+            # we're above the full range
+            complete_ts.append(None)
+            continue
+
+        # now we have the right range. Do a linear interpolation
+
+        if a_thr == next_pt[0]:
+            a_ts = next_pt[1]
+        else:
+            a_ts = prev_pt[1] + (a_thr-prev_pt[0])*(next_pt[1]-prev_pt[1])/(next_pt[0]-prev_pt[0])
+
+        complete_ts.append(a_ts)
+
+    return complete_ts
+
+def random_runs(rng, monotonic):
+    runs = []
+    for _ in range(rng.randint(1, 6)):
+        length = rng.randint(2, 12)
+        thr = [round(rng.uniform(0, 1), 2) for _ in range(length)]
+        if monotonic:
+            thr.sort()
+        ts = sorted(rng.uniform(0, 100) for _ in range(length))
+        runs.append((thr, ts))
+
+    return runs
+
+def as_list(values):
+    return [None if np.isnan(value) else value for value in values]
+
+@pytest.mark.parametrize("monotonic", [True, False], ids=["monotonic", "non-monotonic"])
+def test_resample(monotonic):
+    rng = random.Random(1)
+    for _ in range(500):
+        runs = random_runs(rng, monotonic)
+        all_thr = sorted(set().union(*[thr for thr, _ in runs]))
+
+        grid, values = resampling.resample(runs)
+
+        assert grid.tolist() == all_thr
+        for (thr, ts), row in zip(runs, values):
+            assert as_list(row) == pytest.approx(do_complete_ts(all_thr, thr, ts))
+
+def test_resample_grid():
+    runs = [([0.1, 0.2, 0.3], [10, 20, 40]), ([0.15, 0.25], [5, 15])]
+    grid = [0.05, 0.1, 0.15, 0.25, 0.3, 0.35]
+
+    _, values = resampling.resample(runs, grid)
+
+    for (thr, ts), row in zip(runs, values):
+        assert as_list(row) == pytest.approx(do_complete_ts(grid, thr, ts))
+
+def test_resample_single_point():
+    # only reached at its own threshold
+    _, values = resampling.resample([([0.5], [3])], [0.4, 0.5, 0.6])
+
+    assert as_list(values[0]) == [None, 3, None]
+
+def test_resample_empty():
+    grid, values = resampling.resample([])
+
+    assert len(grid) == 0 and values.shape == (0, 0)
+
+def test_bands():
+    rng = random.Random(2)
+    runs = random_runs(rng, monotonic=True) + random_runs(rng, monotonic=True)
+
+    _, values = resampling.resample(runs)
+    bands = resampling.bands(values)
+
+    for idx, column in enumerate(values.T):
+        column = [value for value in column if not np.isnan(value)]
+
+        assert bands["count"][idx] == len(column)
+        if column:
+            assert bands["mean"][idx] == pytest.approx(statistics.mean(column))
+        if len(column) > 1:
+            assert bands["stdev"][idx] == pytest.approx(statistics.stdev(column))
+        else:
+            assert np.isnan(bands["stdev"][idx])
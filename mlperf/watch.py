@@ -0,0 +1,252 @@
+"""
+Watches a results tree for the result directories created and the pod
+logs appended while the benchmarks run.
+
+The watcher runs in a background thread. It relies on inotify (through
+the libc, Linux only), or on polling the result files when inotify is
+not available.
+"""
+
+import os
+import glob
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import functools
+import threading
+
+# max delay (in seconds) between a modification and its report
+WATCH_DELAY = float(os.environ.get("MATBENCH_MLPERF_WATCH_DELAY", 2))
+# interval (in seconds) of the file checks when inotify isn't available
+POLL_INTERVAL = 10
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+INOTIFY_EVENT = struct.Struct("iIII")
+
+# held by the watcher thread while it updates the matrix and the results,
+# and by the plots while they read them
+RESULTS_LOCK = threading.RLock()
+
+def _reset_results_lock():
+    # the watcher thread doesn't run in the forked processes (like the
+    # report workers), and the lock may have been held by another thread
+    global RESULTS_LOCK
+
+    RESULTS_LOCK = threading.RLock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_results_lock)
+
+def lock_results(stat):
+    """Makes the `do_plot` method of `stat` hold RESULTS_LOCK."""
+
+    do_plot = stat.do_plot
+
+    @functools.wraps(do_plot)
+    def locked_do_plot(*args, **kwargs):
+        with RESULTS_LOCK:
+            return do_plot(*args, **kwargs)
+
+    stat.do_plot = locked_do_plot
+
+def _is_result_file(dirname, fname):
+    if fname == "settings" or (fname.startswith("run-") and fname.endswith(".log")):
+        return True
+
+    return os.path.basename(dirname) == "metrics" and fname.startswith("prom_")
+
+def _result_dir(dirname):
+    return os.path.dirname(dirname) if os.path.basename(dirname) == "metrics" else dirname
+
+
+class Inotify():
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name:
+            raise OSError(errno.ENOSYS, "libc not found")
+
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self.libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify not available")
+
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.watches = {} # wd -> dirname
+
+    def add_watch(self, dirname):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirname), WATCH_MASK)
+        if wd < 0:
+            # the directory may have been removed in the meantime
+            return
+
+        self.watches[wd] = dirname
+
+    def close(self):
+        os.close(self.fd)
+        self.fd = -1
+
+    def read_events(self, timeout):
+        """Yields the (dirname, fname, mask) of the events received before `timeout`."""
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return
+
+        buf = os.read(self.fd, 64 * 1024)
+        pos = 0
+        while pos < len(buf):
+            wd, mask, cookie, name_len = INOTIFY_EVENT.unpack_from(buf, pos)
+            pos += INOTIFY_EVENT.size
+            fname = os.fsdecode(buf[pos:pos + name_len].rstrip(b"\0"))
+            pos += name_len
+
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+
+            yield self.watches.get(wd), fname, mask
+
+
+class Watcher(threading.Thread):
+    """
+    Reports the result directories of `results_dir` with new or
+    modified result files (settings, run-*.log, metrics/prom_*.json).
+
+    `on_update(dirname, closed)` is called from the watcher thread,
+    once the oldest modification not reported yet is WATCH_DELAY
+    seconds old, so that the logs written continuously are reported
+    too. `closed` tells if the log files of the directory were closed
+    by their writer.
+    """
+
+    def __init__(self, results_dir, on_update):
+        super().__init__(name="mlperf-watch", daemon=True)
+
+        self.results_dir = os.path.abspath(results_dir)
+        self.on_update = on_update
+        self.stopped = threading.Event()
+
+        try:
+            self.inotify = Inotify()
+        except OSError as e:
+            print(f"WARNING: inotify not available ({e}), polling {self.results_dir} "
+                  f"every {POLL_INTERVAL}s instead ...")
+            self.inotify = None
+
+        # file -> (size, mtime) of the last poll
+        self.file_stats = {}
+
+        # the initial state is captured before the thread starts,
+        # so that no modification is missed
+        if self.inotify:
+            self._watch_tree(self.results_dir, report=False)
+        else:
+            self._poll(report=False)
+
+    def stop(self):
+        """Stops the watcher, and waits for the end of its thread."""
+
+        self.stopped.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+
+        if self.inotify and not self.is_alive():
+            self.inotify.close()
+            self.inotify = None
+
+    def run(self):
+        if self.inotify:
+            self._run_inotify()
+        else:
+            while not self.stopped.wait(POLL_INTERVAL):
+                self._poll(report=True)
+
+    def _report(self, dirty):
+        for dirname, closed in sorted(dirty.items()):
+            if self.stopped.is_set():
+                return
+
+            try:
+                self.on_update(dirname, closed)
+            except Exception as e:
+                print(f"WARNING: failed to update the results of '{dirname}': {e.__class__.__name__}: {e}")
+
+    def _watch_tree(self, top_dir, report, dirty=None):
+        for this_dir, directories, files in os.walk(top_dir):
+            self.inotify.add_watch(this_dir)
+
+            if report and any(_is_result_file(this_dir, fname) for fname in files):
+                dirty.setdefault(_result_dir(this_dir), False)
+
+    def _run_inotify(self):
+        dirty = {}
+        first_event = None # time of the oldest event not reported yet
+        while not self.stopped.is_set():
+            timeout = max(first_event + WATCH_DELAY - time.monotonic(), 0) if dirty else 1
+            for dirname, fname, mask in self.inotify.read_events(timeout):
+                if first_event is None:
+                    first_event = time.monotonic()
+
+                if mask & IN_Q_OVERFLOW:
+                    # events were lost, rescan the whole tree
+                    self._watch_tree(self.results_dir, report=True, dirty=dirty)
+                    continue
+
+                if dirname is None:
+                    continue
+
+                path = os.path.join(dirname, fname)
+
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        # files may have been created before the watch was added
+                        self._watch_tree(path, report=True, dirty=dirty)
+                    continue
+
+                if not _is_result_file(dirname, fname):
+                    continue
+
+                result_dir = _result_dir(dirname)
+                closed = bool(mask & IN_CLOSE_WRITE) and fname.endswith(".log")
+                dirty[result_dir] = dirty.get(result_dir, False) or closed
+
+            if not dirty:
+                first_event = None
+            elif time.monotonic() - first_event >= WATCH_DELAY:
+                self._report(dirty)
+                dirty = {}
+                first_event = None
+
+    def _poll(self, report):
+        dirty = {}
+        file_stats = {}
+        patterns = ["**/settings", "**/run-*.log", "**/metrics/prom_*.json"]
+        for pattern in patterns:
+            for fname in glob.glob(f"{self.results_dir}/{pattern}", recursive=True):
+                try:
+                    stat = os.stat(fname)
+                except FileNotFoundError:
+                    continue
+
+                file_stats[fname] = stat.st_size, stat.st_mtime_ns
+                if file_stats[fname] != self.file_stats.get(fname):
+                    dirty[_result_dir(os.path.dirname(fname))] = False
+
+        self.file_stats = file_stats
+
+        if report:
+            self._report(dirty)
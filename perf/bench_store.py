@@ -0,0 +1,215 @@
+#! /usr/bin/python3
+
+"""
+Measures the import performance of the store parsers: wall time, peak
+RSS and throughput, over a results tree generated by
+generate_corpus.py.
+
+Each parser runs in its own process, so that its peak RSS can be
+measured. The measurements are saved as JSON, and compared with a
+previous measurement file if one is given.
+
+Must run in an environment where MatrixBenchmarking is importable.
+
+Usage: bench_store.py CORPUS_DIR [--parsers mlperf,phoronix,...]
+                      [--repeat N] [--output FILE] [--compare FILE]
+"""
+
+import os
+import sys
+import json
+import time
+import pathlib
+import argparse
+import datetime
+import platform
+import resource
+import subprocess
+import importlib
+import importlib.util
+
+THIS_DIR = pathlib.Path(os.path.dirname(os.path.abspath(__file__)))
+PLUGINS_DIR = THIS_DIR.parent
+
+# imported from the shared directory, the plugins package may not exist yet
+sys.path.insert(0, str(PLUGINS_DIR / "shared"))
+from plugins_package import import_plugins_package
+
+# regressions above this ratio are reported
+REGRESSION_THRESHOLD = 1.10
+
+def read_settings(dirname):
+    settings = {}
+    with open(dirname / "settings") as f:
+        for line in f.readlines():
+            key, found, value = line.strip().partition("=")
+            if found:
+                settings[key] = value
+
+    return settings
+
+def settings_dirs(results_dir):
+    return [pathlib.Path(this_dir) for this_dir, directories, files in sorted(os.walk(results_dir))
+            if "settings" in files]
+
+def corpus_size(results_dir, patterns):
+    files = [fname for pattern in patterns for fname in results_dir.glob(pattern)]
+
+    return len(files), sum(fname.stat().st_size for fname in files)
+
+def bench_mlperf(mlperf_store, results_dir):
+    os.environ.setdefault("MATBENCH_MLPERF_CACHE", "0")
+    # the watcher would outlive the measurement
+    os.environ["MATBENCH_MLPERF_WATCH"] = "0"
+
+    # with MATBENCH_MLPERF_IMPORT_WORKERS, parse_data prefetches the pod logs in parallel
+    mlperf_store.parse_data(str(results_dir))
+
+def bench_phoronix(phoronix_store, results_dir):
+    phoronix_store.parse_data(str(results_dir))
+
+def bench_sample(sample_store, results_dir):
+    results = []
+    for dirname in settings_dirs(results_dir):
+        sample_store._parse_directory(results.append, dirname, read_settings(dirname))
+
+PARSERS = {
+    # name: (store module, bench function, corpus sub-directory, parsed files, environment)
+    "mlperf": ("plugins.mlperf.store", bench_mlperf, "mlperf", ["**/run-*.log"], {}),
+    "mlperf-stream": ("plugins.mlperf.store", bench_mlperf, "mlperf", ["**/run-*.log"],
+                      {"MATBENCH_MLPERF_LOG_SCANNER": "stream"}),
+    "mlperf-parallel": ("plugins.mlperf.store", bench_mlperf, "mlperf", ["**/run-*.log"],
+                        {"MATBENCH_MLPERF_IMPORT_WORKERS": "0"}),
+    "phoronix": ("plugins.phoronix.store", bench_phoronix, "phoronix", ["**/composite.xml"], {}),
+    "sample": ("plugins.sample.store", bench_sample, "sample", ["**/date", "**/procs", "**/memfree"], {}),
+}
+
+def run_child(parser_name, corpus_dir):
+    """Runs one parser in this process, and prints its measurements as JSON."""
+
+    import_plugins_package()
+
+    store_module, fct, subdir, patterns, _ = PARSERS[parser_name]
+    results_dir = corpus_dir / subdir
+
+    # the store and its dependencies are imported before the measurement
+    store = importlib.import_module(store_module)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    fct(store, results_dir)
+
+    wall_time = time.perf_counter() - start
+    cpu_time = time.process_time() - cpu_start
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+    file_count, byte_count = corpus_size(results_dir, patterns)
+
+    print(json.dumps(dict(
+        wall_time_s=wall_time,
+        cpu_time_s=cpu_time,
+        peak_rss_kb=max(rss_peak, rss_children),
+        import_rss_kb=rss_before,
+        files=file_count,
+        bytes=byte_count,
+        files_per_s=file_count / wall_time if wall_time else None,
+        mb_per_s=byte_count / 1024 / 1024 / wall_time if wall_time else None,
+    )))
+
+def bench(parser_name, corpus_dir, repeat):
+    env = os.environ | PARSERS[parser_name][4]
+
+    runs = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, __file__, str(corpus_dir), "--child", parser_name],
+                              env=env, stdout=subprocess.PIPE, check=True)
+        runs.append(json.loads(proc.stdout.decode().strip().splitlines()[-1]))
+
+    # keep the fastest run, the others are disturbed by the system
+    best = min(runs, key=lambda run: run["wall_time_s"])
+    best["repeat"] = repeat
+
+    return best
+
+def git_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=PLUGINS_DIR,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              check=True).stdout.decode().strip()
+    except Exception:
+        return None
+
+def compare(results, previous):
+    print()
+    print(f"Comparison with {previous['version']} ({previous['date']}):")
+    regressions = 0
+    for parser_name, measures in results.items():
+        prev_measures = previous["results"].get(parser_name)
+        if not prev_measures:
+            continue
+
+        for key in "wall_time_s", "peak_rss_kb":
+            ratio = measures[key] / prev_measures[key] if prev_measures[key] else 1
+            regression = ratio > REGRESSION_THRESHOLD
+            regressions += regression
+
+            print(f"  {parser_name:16s} {key:12s} {prev_measures[key]:12.3f} --> {measures[key]:12.3f} "
+                  f"({ratio:.2f}x){' REGRESSION' if regression else ''}")
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the store parsers.")
+    parser.add_argument("corpus_dir", type=pathlib.Path)
+    parser.add_argument("--parsers", default=",".join(PARSERS),
+                        help="comma-separated list of the parsers to benchmark")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=pathlib.Path, help="file where the measurements are saved")
+    parser.add_argument("--compare", type=pathlib.Path, help="previous measurements to compare with")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.corpus_dir)
+        return 0
+
+    results = {}
+    for parser_name in args.parsers.split(","):
+        if not (args.corpus_dir / PARSERS[parser_name][2]).exists():
+            print(f"WARNING: no {PARSERS[parser_name][2]} corpus in {args.corpus_dir}, skipping {parser_name} ...")
+            continue
+
+        print(f"Benchmarking {parser_name} ...")
+        results[parser_name] = measures = bench(parser_name, args.corpus_dir, args.repeat)
+        print(f"  {measures['wall_time_s']:.3f}s, {measures['peak_rss_kb'] / 1024:.1f} MB peak RSS, "
+              f"{measures['files_per_s']:.1f} files/s, {measures['mb_per_s']:.1f} MB/s")
+
+    output = dict(
+        version=git_version(),
+        date=datetime.datetime.now().isoformat(timespec="seconds"),
+        python=platform.python_version(),
+        host=platform.node(),
+        corpus=str(args.corpus_dir),
+        results=results,
+    )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+        print(f"Measurements saved into {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+
+        if compare(results, previous):
+            return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+#! /usr/bin/python3
+
+"""
+Generates synthetic result trees, shaped like the artifacts of the
+mlperf, phoronix and sample workloads, to measure the performance of
+their store parsers without real cluster artifacts.
+
+Usage: generate_corpus.py OUTPUT_DIR [--runs N] [--log-lines N]
+                          [--composite-files N] [--results-per-file N]
+                          [--workloads mlperf,phoronix,sample]
+"""
+
+import os
+import sys
+import json
+import uuid
+import random
+import pathlib
+import argparse
+
+from xml.sax.saxutils import escape
+
+MLLOG_PREFIX = ":::MLLOG "
+
+MIG_TYPES = {
+    # gpu_type: number of instances per GPU
+    "1g.5gb": 7,
+    "2g.10gb": 3,
+    "3g.20gb": 2,
+    "7g.40gb": 1,
+    "full": 1,
+}
+
+def write_settings(dirname, settings):
+    with open(dirname / "settings", "w") as f:
+        for key, value in settings.items():
+            print(f"{key}={value}", file=f)
+
+def mllog(gpu_prefix, time_ms, key, value, event_type="POINT"):
+    content = dict(namespace="", time_ms=time_ms, event_type=event_type, key=key, value=value,
+                   metadata=dict(file="train.py", lineno=42))
+
+    return gpu_prefix + MLLOG_PREFIX + json.dumps(content)
+
+def generate_mlperf_log(fname, rng, gpu_prefixes, log_lines):
+    lines = []
+    time_ms = rng.randrange(1_600_000_000_000, 1_700_000_000_000)
+    for gpu_prefix in gpu_prefixes:
+        lines.append(mllog(gpu_prefix, time_ms, "init_start", None, event_type="INTERVAL_START"))
+
+    thresholds = {gpu_prefix: 0.0 for gpu_prefix in gpu_prefixes}
+    for i in range(log_lines):
+        time_ms += rng.randrange(10, 200)
+        gpu_prefix = rng.choice(gpu_prefixes)
+        kind = rng.random()
+
+        if kind < 0.005:
+            thresholds[gpu_prefix] = min(0.25, thresholds[gpu_prefix] + rng.uniform(-0.005, 0.02))
+            lines.append(mllog(gpu_prefix, time_ms, "eval_accuracy", thresholds[gpu_prefix]))
+        elif kind < 0.05:
+            lines.append(mllog(gpu_prefix, time_ms, "tracked_stats", {"throughput": rng.uniform(100, 900)}))
+        else:
+            lines.append(f"{gpu_prefix}Iteration: {i:6d}, Loss function: {rng.uniform(2, 10):.3f}, "
+                         f"Average Loss: {rng.uniform(2, 10):.3f}, lr: {rng.uniform(0, 0.1):.5f}")
+
+    for gpu_prefix in gpu_prefixes:
+        gpu_name = gpu_prefix.rstrip(":") if gpu_prefix else ""
+        lines.append(f"{gpu_name}{': ' if gpu_name else ''}Training performance: "
+                     f"avg. samples / sec: {rng.uniform(50, 900):.2f}")
+
+    lines.append(f"result={rng.randrange(600, 12000)}")
+
+    with open(fname, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+def generate_mlperf(output_dir, rng, runs, log_lines):
+    configs = []
+    for gpu_type, instances in MIG_TYPES.items():
+        for gpu_count in (1, 2, 4, 8):
+            configs.append((gpu_type, instances, gpu_count, 1))
+    configs += [("full", 1, 1, pod_count) for pod_count in (2, 4, 8)]
+
+    for run in range(runs):
+        gpu_type, instances, gpu_count, pod_count = configs[run % len(configs)]
+        repeat = run // len(configs)
+
+        dirname = output_dir / "mlperf" / "20211209" / f"gpu={gpu_type}_{gpu_count}gpu_x_{pod_count}pod" / f"run_{repeat}"
+        dirname.mkdir(parents=True, exist_ok=True)
+
+        write_settings(dirname, dict(
+            expe="dgx-benchmark", flavor="20211209", benchmark="ssd",
+            gpu_type=gpu_type if gpu_type == "full" else f"{gpu_type}_{instances * gpu_count}",
+            gpu_count=gpu_count, pod_count=pod_count, threshold=0.2,
+            mig_strategy="none" if gpu_type == "full" else "mixed",
+            execution_mode="fast", run=repeat,
+        ))
+
+        for pod in range(pod_count):
+            if gpu_type == "full" and pod_count == 1 and gpu_count == 1:
+                gpu_prefixes = [""]
+            else:
+                gpu_prefixes = [f"/tmp/ssd_MIG-GPU-{uuid.UUID(int=rng.getrandbits(128))}.log:"
+                                for _ in range(instances * gpu_count // pod_count or 1)]
+
+            generate_mlperf_log(dirname / f"run-ssd-{pod}.log", rng, gpu_prefixes, log_lines)
+
+PHORONIX_TESTS = [
+    ("pts/polybench-c-1.2.0", "PolyBench-C", "4.2", "Test: {arg}", "Seconds", "LIB"),
+    ("pts/openssl-3.0.0", "OpenSSL", "1.1.1", "Algorithm: {arg}", "sign/s", "HIB"),
+    ("pts/compress-7zip-1.9.0", "7-Zip Compression", "21.06", "Test: {arg}", "MIPS", "HIB"),
+    ("pts/c-ray-1.2.0", "C-Ray", "1.1", "Total Time - {arg}", "Seconds", "LIB"),
+]
+
+def generate_phoronix_result(rng, system, result_idx):
+    identifier, title, app_version, description, scale, proportion = PHORONIX_TESTS[result_idx % len(PHORONIX_TESTS)]
+    argument = f"arg-{result_idx // len(PHORONIX_TESTS)}"
+
+    trials = [rng.uniform(1, 100) for _ in range(rng.randrange(3, 16))]
+    has_value = rng.random() > 0.05
+    value = f"{sum(trials) / len(trials):.3f}" if has_value else ""
+    raw_string = ":".join(f"{trial:.3f}" for trial in trials) if has_value else ""
+    json_content = json.dumps({"compiler-options": {"compiler-type": "CC", "compiler": "gcc"},
+                               "test-run-times": ":".join(f"{trial:.2f}" for trial in trials)})
+
+    return f"""  <Result>
+    <Identifier>{identifier}</Identifier>
+    <Title>{title}</Title>
+    <AppVersion>{app_version}</AppVersion>
+    <Arguments>{argument}</Arguments>
+    <Description>{escape(description.format(arg=argument))}</Description>
+    <Scale>{scale}</Scale>
+    <Proportion>{proportion}</Proportion>
+    <DisplayFormat>BAR_GRAPH</DisplayFormat>
+    <Data>
+      <Entry>
+        <Identifier>{escape(system)}</Identifier>
+        <Value>{value}</Value>
+        <RawString>{raw_string}</RawString>
+        <JSON>{escape(json_content)}</JSON>
+      </Entry>
+    </Data>
+  </Result>
+"""
+
+def generate_phoronix(output_dir, rng, composite_files, results_per_file):
+    for file_idx in range(composite_files):
+        cloud = ["gcp", "aws", "azure"][file_idx % 3]
+        cpumanager = ["normal", "static"][file_idx // 3 % 2]
+        variant = file_idx // 6
+        cpus = f"{file_idx % 2 + 1}cpu"
+
+        dirname = output_dir / "phoronix" / "single-threaded" / cloud / f"cpumanager-{cpumanager}-{variant}" / cpus
+        dirname.mkdir(parents=True, exist_ok=True)
+
+        system = f"Intel Xeon {rng.randrange(1000, 9999)}"
+        with open(dirname / "composite.xml", "w") as f:
+            f.write(f"""<?xml version="1.0"?>
+<!--Phoronix Test Suite v10.8.1-->
+<PhoronixTestSuite>
+  <Generated>
+    <Title>synthetic-{file_idx}</Title>
+    <TestClient>Phoronix Test Suite v10.8.1</TestClient>
+    <Description>Synthetic results</Description>
+  </Generated>
+  <System>
+    <Identifier>{system}</Identifier>
+    <Hardware>Processor: {system}</Hardware>
+    <Software>OS: CentOS Stream 8</Software>
+  </System>
+""")
+            for result_idx in range(results_per_file):
+                f.write(generate_phoronix_result(rng, system, result_idx))
+            f.write("</PhoronixTestSuite>\n")
+
+def generate_sample(output_dir, rng, runs):
+    modes = {
+        "date": ["date"],
+        "procs": ["bandwidth", "latency"],
+        "memfree": ["osu-allreduce", "osu-alltoall"],
+    }
+    configs = [(mode, operation, node_count)
+               for mode, operations in modes.items()
+               for operation in operations
+               for node_count in (2, 4, 8, 16)]
+
+    for run in range(runs):
+        mode, operation, node_count = configs[run % len(configs)]
+        repeat = run // len(configs) + 1
+
+        dirname = output_dir / "sample" / mode / "aws-c4.xlarge" / f"{operation}_{node_count}x" / f"run_{repeat}"
+        dirname.mkdir(parents=True, exist_ok=True)
+
+        write_settings(dirname, dict(
+            run=repeat, machine="c4.xlarge", type="benchmark", cloud="aws",
+            network="SDN", env="prod", mode=mode, operation=operation,
+            node_count=node_count, expe=mode,
+        ))
+
+        value = {
+            "date": rng.randrange(1_600_000_000, 1_700_000_000),
+            "procs": rng.randrange(100, 1000),
+            "memfree": rng.randrange(1_000_000, 8_000_000),
+        }[mode]
+
+        with open(dirname / mode, "w") as f:
+            print(value, file=f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic result trees for the store parsers.")
+    parser.add_argument("output_dir", type=pathlib.Path)
+    parser.add_argument("--workloads", default="mlperf,phoronix,sample",
+                        help="comma-separated list of the workloads to generate")
+    parser.add_argument("--runs", type=int, default=100,
+                        help="number of mlperf and sample run directories")
+    parser.add_argument("--log-lines", type=int, default=20000,
+                        help="number of lines of the mlperf pod logs")
+    parser.add_argument("--composite-files", type=int, default=12,
+                        help="number of phoronix composite.xml files")
+    parser.add_argument("--results-per-file", type=int, default=200,
+                        help="number of <Result> elements per composite.xml file")
+    parser.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    workloads = args.workloads.split(",")
+
+    if "mlperf" in workloads:
+        print(f"Generating {args.runs} mlperf runs ...")
+        generate_mlperf(args.output_dir, rng, args.runs, args.log_lines)
+
+    if "phoronix" in workloads:
+        print(f"Generating {args.composite_files} phoronix composite files ...")
+        generate_phoronix(args.output_dir, rng, args.composite_files, args.results_per_file)
+
+    if "sample" in workloads:
+        print(f"Generating {args.runs} sample runs ...")
+        generate_sample(args.output_dir, rng, args.runs)
+
+    print(f"Corpus generated in {args.output_dir}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
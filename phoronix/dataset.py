@@ -0,0 +1,239 @@
+"""
+Columnar dataset of the parsed Phoronix results, compiled from the
+composite.xml files of a results tree and stored as a NumPy `.npz`
+file at the top of the tree.
+
+The dataset records the size, mtime and content hash of each source
+file. A file whose size or mtime changed is hashed again, and is only
+parsed again if its content changed.
+
+The strings are stored as one UTF-8 bytes column and the offsets of
+each row, and the fields of the results are only read from the dataset
+when they're first accessed.
+"""
+
+import os
+import pathlib
+import hashlib
+
+import numpy as np
+
+from plugins.phoronix import records as result_records
+from plugins.shared import sidecar
+
+DATASET_FILENAME = ".phoronix_results.npz"
+DATASET_FORMAT_VERSION = 5
+
+PARSER_FILES = ["store.py", "trials.py", "dataset.py", "records.py"]
+
+# fields of the results, stored as one column each (plus the offsets and the nulls of the strings)
+STR_FIELDS = ["Identifier", "Title", "AppVersion", "Arguments", "Description",
+              "Scale", "Proportion", "DisplayFormat", "Data_Identifier", "Data_RawString"]
+FLOAT_FIELDS = ["Data_Value", "Data_Mean", "Data_Stdev", "Data_Min", "Data_Max",
+                "Data_Median", "Data_Ci"]
+# variable length fields, stored as one flat column and the offsets of each row
+ARRAY_FIELDS = ["Data_Samples", "Data_RunTimes"]
+
+FIELDS = set(STR_FIELDS + FLOAT_FIELDS + ARRAY_FIELDS)
+
+def parser_version():
+    return sidecar.parser_version(__file__, PARSER_FILES)
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class FileInfo():
+    """Size, mtime and content hash of a source file."""
+
+    __slots__ = ("size", "mtime_ns", "hash")
+
+    def __init__(self, size, mtime_ns, hash=None):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.hash = hash
+
+    @classmethod
+    def from_stat(cls, stat):
+        return cls(stat.st_size, stat.st_mtime_ns)
+
+
+def _encode_strings(values):
+    """
+    Encodes the `values` strings (None if null) as one UTF-8 bytes
+    column. Returns it with the offsets of each row and the nulls.
+    """
+
+    encoded = [b"" if value is None else value.encode() for value in values]
+
+    return (np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            np.cumsum([0] + [len(value) for value in encoded], dtype=np.int64),
+            np.array([value is None for value in values], dtype=bool))
+
+
+class DatasetResult(result_records.ResultRecord):
+    """
+    Results of one row of the dataset. Each field is read from the
+    dataset the first time it is accessed.
+    """
+
+    __slots__ = ("_dataset_row",)
+
+    def __init__(self, dataset, row):
+        self._dataset_row = dataset, row
+
+    def __getattr__(self, name):
+        # only called for the fields not read yet
+        if name not in FIELDS:
+            raise AttributeError(name)
+
+        dataset, row = self._dataset_row
+        value = dataset.value(name, row)
+        setattr(self, name, value)
+
+        return value
+
+
+class Dataset():
+    """
+    Dataset of a results tree, loaded from its `.npz` file. The columns
+    are only read from the file when they're first accessed.
+    """
+
+    def __init__(self, results_dir):
+        self.results_dir = results_dir
+        self.columns = None
+        self._loaded = {} # column name -> array
+        self._strings = {} # string field -> (bytes, offsets, nulls)
+        self.files = {} # relative path -> (FileInfo, first row, last row + 1)
+
+        fname = os.path.join(results_dir, DATASET_FILENAME)
+        try:
+            columns = np.load(fname)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"WARNING: failed to load the Phoronix dataset of '{results_dir}': {e.__class__.__name__}: {e}")
+            return
+
+        if int(columns["format"]) != DATASET_FORMAT_VERSION or str(columns["parser"]) != parser_version():
+            return
+
+        self.columns = columns
+
+        offsets = self.column("file_offsets").tolist()
+        file_paths = [self.string("file_path", idx) for idx in range(len(offsets) - 1)]
+        for idx, (relpath, size, mtime_ns, hash) in enumerate(zip(file_paths,
+                                                                  self.column("file_size").tolist(),
+                                                                  self.column("file_mtime_ns").tolist(),
+                                                                  self.column("file_hash").tolist())):
+            self.files[relpath] = FileInfo(size, mtime_ns, hash), offsets[idx], offsets[idx + 1]
+
+    def column(self, name):
+        if name not in self._loaded:
+            self._loaded[name] = self.columns[name]
+
+        return self._loaded[name]
+
+    def string(self, field, row):
+        if field not in self._strings:
+            self._strings[field] = (self.column(field).tobytes(),
+                                    self.column(f"{field}_offsets").tolist(),
+                                    self.column(f"{field}_null").tolist())
+
+        data, offsets, nulls = self._strings[field]
+        if nulls[row]:
+            return None
+
+        return data[offsets[row]:offsets[row + 1]].decode()
+
+    def value(self, field, row):
+        """Returns the value of the `field` of the results of `row`."""
+
+        if field in STR_FIELDS:
+            return self.string(field, row)
+
+        if field in FLOAT_FIELDS:
+            return self.column(field)[row].item()
+
+        offsets = self.column(f"{field}_offsets")
+
+        return self.column(field)[offsets[row]:offsets[row + 1]]
+
+    def is_valid(self, relpath, info):
+        """
+        Tells if the records of `relpath` are still valid for the current
+        `info` of the file. The hash of `info` is computed if the size or
+        mtime changed.
+        """
+
+        if relpath not in self.files:
+            return False
+
+        known_info = self.files[relpath][0]
+        if (known_info.size, known_info.mtime_ns) == (info.size, info.mtime_ns):
+            info.hash = known_info.hash
+            return True
+
+        if info.hash is None:
+            info.hash = file_hash(os.path.join(self.results_dir, relpath))
+
+        return info.hash == known_info.hash
+
+    def records(self, relpath):
+        """Returns the list of the (ResultRef, ResultRecord) records of `relpath`."""
+
+        _, start, stop = self.files[relpath]
+        rows = [DatasetResult(self, row) for row in range(start, stop)]
+
+        path = pathlib.Path(self.results_dir) / relpath
+        result_indexes = self.column("result_index")[start:stop].tolist()
+
+        return [(result_records.ResultRef(path, result_idx), results)
+                for result_idx, results in zip(result_indexes, rows)]
+
+
+def write(results_dir, file_records):
+    """
+    Saves the dataset of `results_dir`. `file_records` is the list of
+    the (relative path, FileInfo, records) of its composite files.
+    """
+
+    all_results = [results for _, _, records in file_records for _, results in records]
+    result_indexes = [location.index for _, _, records in file_records for location, _ in records]
+
+    columns = dict(
+        format=DATASET_FORMAT_VERSION,
+        parser=parser_version(),
+        file_size=np.array([info.size for _, info, _ in file_records], dtype=np.int64),
+        file_mtime_ns=np.array([info.mtime_ns for _, info, _ in file_records], dtype=np.int64),
+        file_hash=np.array([info.hash for _, info, _ in file_records], dtype=str),
+        file_offsets=np.cumsum([0] + [len(records) for _, _, records in file_records], dtype=np.int64),
+        result_index=np.array(result_indexes, dtype=np.int64),
+    )
+
+    columns["file_path"], columns["file_path_offsets"], columns["file_path_null"] = \
+        _encode_strings([relpath for relpath, _, _ in file_records])
+
+    for field in STR_FIELDS:
+        columns[field], columns[f"{field}_offsets"], columns[f"{field}_null"] = \
+            _encode_strings([getattr(results, field) for results in all_results])
+
+    for field in FLOAT_FIELDS:
+        columns[field] = np.array([getattr(results, field) for results in all_results], dtype=np.float64)
+
+    for field in ARRAY_FIELDS:
+        arrays = [getattr(results, field) for results in all_results]
+        columns[field] = np.concatenate(arrays) if arrays else np.empty(0)
+        columns[f"{field}_offsets"] = np.cumsum([0] + [len(array) for array in arrays], dtype=np.int64)
+
+    try:
+        sidecar.write_atomic(os.path.join(results_dir, DATASET_FILENAME),
+                             lambda f: np.savez(f, **columns), binary=True)
+    except Exception as e:
+        print(f"WARNING: failed to save the Phoronix dataset of '{results_dir}': {e.__class__.__name__}: {e}")
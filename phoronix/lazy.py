@@ -0,0 +1,151 @@
+"""
+Header scanner of the Phoronix composite files, for the lazy import
+mode: only the fields identifying each `<Result>` are read, along with
+the byte range of the element, so that the element can be parsed when
+its results are first accessed.
+"""
+
+import os
+import xml.parsers.expat
+import xml.etree.ElementTree as ET
+
+# fields of the Result elements read by the scanner
+HEADER_FIELDS = ("Title", "AppVersion", "Arguments")
+
+VALUE_PATH = ["Result", "Data", "Entry", "Value"]
+
+class ScannedFile():
+    """
+    Size, mtime and encoding of a composite file when it was scanned:
+    the byte ranges of its Result elements are only valid as long as
+    the file didn't change.
+    """
+
+    __slots__ = ("size", "mtime_ns", "encoding")
+
+    def __init__(self, stat, encoding):
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.encoding = encoding or "utf-8"
+
+    def check(self, stat, path):
+        if (stat.st_size, stat.st_mtime_ns) != (self.size, self.mtime_ns):
+            raise ValueError(f"{path} changed since it was imported, the results must be imported again")
+
+class ResultHeader():
+    """
+    Header of one Result element: its HEADER_FIELDS (None if the element
+    is missing), if its first Data/Entry has a Value, and the byte range
+    of the element, from its start tag to the start of its end tag.
+    """
+
+    __slots__ = ("start", "end", "fields", "has_value")
+
+    def __init__(self, start):
+        self.start = start
+        self.end = None
+        self.fields = dict.fromkeys(HEADER_FIELDS)
+        self.has_value = False
+
+
+class _Scanner():
+    def __init__(self):
+        self.parser = xml.parsers.expat.ParserCreate()
+        self.parser.buffer_text = True
+        self.parser.StartElementHandler = self.start_element
+        self.parser.EndElementHandler = self.end_element
+        self.parser.CharacterDataHandler = self.character_data
+        self.parser.XmlDeclHandler = self.xml_decl
+
+        self.encoding = None
+        self.path = []
+        self.headers = []
+        self.current = None # header of the Result being scanned
+        self.text = None # text of the field being read
+        self.value_seen = False
+
+    def xml_decl(self, version, encoding, standalone):
+        self.encoding = encoding
+
+    def start_element(self, name, attrs):
+        self.path.append(name)
+
+        if len(self.path) == 2:
+            if name == "Result":
+                self.current = ResultHeader(self.parser.CurrentByteIndex)
+                self.value_seen = False
+            return
+
+        if self.current is None:
+            return
+
+        if len(self.path) == 3 and name in HEADER_FIELDS:
+            self.text = []
+        elif self.path[1:] == VALUE_PATH and not self.value_seen:
+            # only the first Data/Entry/Value is considered
+            self.value_seen = True
+            self.text = []
+
+    def end_element(self, name):
+        depth = len(self.path)
+        self.path.pop()
+
+        if self.current is None:
+            return
+
+        if depth == 2:
+            self.current.end = self.parser.CurrentByteIndex
+            self.headers.append(self.current)
+            self.current = None
+            return
+
+        if self.text is None:
+            return
+
+        text = "".join(self.text)
+        self.text = None
+
+        if depth == 3:
+            self.current.fields[name] = text
+        else:
+            self.current.has_value = bool(text)
+
+    def character_data(self, data):
+        if self.text is not None:
+            self.text.append(data)
+
+
+def scan_results(path):
+    """
+    Scans the top-level Result elements of `path`. Returns the
+    ScannedFile state of the file, and the list of the ResultHeader of
+    its Result elements.
+    """
+
+    scanner = _Scanner()
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        scanner.parser.ParseFile(f)
+
+    return ScannedFile(stat, scanner.encoding), scanner.headers
+
+
+def read_results(path, ranges, scanned=None):
+    """
+    Parses the Result elements of `path` between the (start, end) byte
+    offsets of `ranges`. If the `scanned` state of the file is given,
+    the file must not have changed since it was scanned, and the
+    elements are decoded with its encoding.
+    """
+
+    encoding = scanned.encoding if scanned is not None else "utf-8"
+
+    with open(path, "rb") as f:
+        if scanned is not None:
+            scanned.check(os.fstat(f.fileno()), path)
+
+        for start, end in ranges:
+            f.seek(start)
+            fragment = f.read(end - start)
+
+            yield ET.fromstring(fragment.decode(encoding) + "</Result>")
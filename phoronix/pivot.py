@@ -0,0 +1,99 @@
+"""
+Pivot index of the Phoronix results: for each benchmark, the values of
+the results as a (repeat x system x argument) array, so that a plot
+only has to slice it instead of iterating over the matrix records.
+
+The entries are registered during the import, and the arrays of a
+benchmark are built the first time it is looked up (or by `build_all`),
+so that the lazy results are only loaded when their benchmark is
+plotted.
+"""
+
+import numpy as np
+
+class BenchmarkPivot():
+    """
+    Values and confidence intervals of the results of one benchmark,
+    indexed by repeat, system and argument, and the metadata of each
+    argument.
+    """
+
+    __slots__ = ("systems", "arguments", "repeats", "values", "ci", "metadata")
+
+    def __init__(self, entries):
+        self.systems = list(dict.fromkeys(system for system, _, _, _ in entries))
+        self.arguments = list(dict.fromkeys(argument for _, argument, _, _ in entries))
+        self.repeats = sorted({repeat for _, _, repeat, _ in entries})
+
+        system_idx = {system: idx for idx, system in enumerate(self.systems)}
+        argument_idx = {argument: idx for idx, argument in enumerate(self.arguments)}
+        repeat_idx = {repeat: idx for idx, repeat in enumerate(self.repeats)}
+
+        shape = len(self.repeats), len(self.systems), len(self.arguments)
+        self.values = np.full(shape, np.nan)
+        self.ci = np.full(shape, np.nan)
+
+        for system, argument, repeat, results in entries:
+            idx = repeat_idx[repeat], system_idx[system], argument_idx[argument]
+            self.values[idx] = results.Data_Value
+            self.ci[idx] = results.Data_Ci
+
+        # argument -> (Description, Scale, Proportion) of its first result
+        self.metadata = {}
+        for _, argument, _, results in entries:
+            if argument not in self.metadata:
+                self.metadata[argument] = results.Description, results.Scale, results.Proportion
+
+    def select(self, repeat="---"):
+        """
+        Returns the (system x argument) values and ci arrays of `repeat`.
+        With all the repeats ("---"), the value of the last repeat of each
+        result is kept.
+        """
+
+        if repeat != "---":
+            repeats = [str(known_repeat) for known_repeat in self.repeats]
+            if str(repeat) not in repeats:
+                empty = np.full(self.values.shape[1:], np.nan)
+                return empty, empty
+
+            idx = repeats.index(str(repeat))
+            return self.values[idx], self.ci[idx]
+
+        # index of the last repeat with a value, for each result
+        has_value = ~np.isnan(self.values)
+        last = len(self.repeats) - 1 - np.argmax(has_value[::-1], axis=0)
+
+        return (np.take_along_axis(self.values, last[None], axis=0)[0],
+                np.take_along_axis(self.ci, last[None], axis=0)[0])
+
+
+_entries = {} # benchmark -> [(system, argument, repeat, results)]
+_pivots = {} # benchmark -> BenchmarkPivot
+
+def clear():
+    _entries.clear()
+    _pivots.clear()
+
+def add(system, benchmark, argument, repeat, results):
+    _entries.setdefault(benchmark, []).append((system, argument, repeat, results))
+    _pivots.pop(benchmark, None)
+
+def get(benchmark):
+    """Returns the BenchmarkPivot of `benchmark`, or None if it has no results."""
+
+    if benchmark not in _pivots:
+        entries = _entries.get(benchmark)
+        if not entries:
+            return None
+
+        _pivots[benchmark] = BenchmarkPivot(entries)
+
+    return _pivots[benchmark]
+
+def benchmarks():
+    return list(_entries)
+
+def build_all():
+    for benchmark in _entries:
+        get(benchmark)
@@ -1,6 +1,7 @@
 from collections import defaultdict
 import statistics as stats
 import datetime
+import math
 from collections import OrderedDict
 
 import plotly.graph_objs as go
@@ -9,8 +10,25 @@ import matrix_benchmarking.plotting.table_stats as table_stats
 from matrix_benchmarking.common import Matrix
 from matrix_benchmarking.plotting.ui import COLORS
 
+from plugins.phoronix import trials
+from plugins.phoronix import pivot
+from plugins.shared import figure_cache
+from plugins.phoronix.plot import comparison
+
+# the parameters of the Phoronix results, which can be looked up in the pivot index
+PIVOT_PARAMS = {"system", "benchmark", "argument", "repeat"}
+
+def _param_order(param_lists, key, values):
+    """Orders `values` like the `key` entries of `param_lists`, the values not listed there last."""
+
+    listed = [value for param_list in param_lists for param_key, value in param_list if param_key == key]
+    ordered = [value for value in listed if value in values]
+
+    return ordered + [value for value in values if value not in ordered]
+
 def register():
     Plot("Plot")
+    comparison.GeomeanComparison("Geomean comparison")
 
 class Plot():
     def __init__(self, name):
@@ -23,6 +41,7 @@ class Plot():
     def do_hover(self, meta_value, variables, figure, data, click_info):
         return "nothing"
 
+    @figure_cache.cached
     def do_plot(self, ordered_vars, params, param_lists, variables, cfg):
         fig = go.Figure()
 
@@ -31,6 +50,7 @@ class Plot():
         scale = "N/A"
         lower_better = None
         system_XY = defaultdict(dict)
+        system_CI = defaultdict(dict)
         system_highlight = params["system"]
         single_argument = "argument" not in variables
 
@@ -47,24 +67,69 @@ class Plot():
             param_lists.append(syst_params)
 
 
-        for entry in Matrix.all_records(params, param_lists):
-            key = entry.params.system if single_argument else entry.results.Arguments
-            if key == "N/A": key = ""
+        benchmark_pivot = pivot.get(params["benchmark"]) if set(params) <= PIVOT_PARAMS else None
+
+        if benchmark_pivot is not None:
+            values, CIs = benchmark_pivot.select(params.get("repeat", "---"))
 
-            system_XY[entry.params.system][key] = entry.results.Data_Value
-            if first:
-                title = entry.results.Description
-                scale = entry.results.Scale
-                lower_better = entry.results.Proportion == "LIB"
-                first = False
+            argument_idx = {argument: idx for idx, argument in enumerate(benchmark_pivot.arguments)}
+            if params.get("argument", "---") != "---":
+                arguments = [params["argument"]] if params["argument"] in argument_idx else []
+            else:
+                arguments = _param_order(param_lists, "argument", benchmark_pivot.arguments)
+
+            system_idx = {system: idx for idx, system in enumerate(benchmark_pivot.systems)}
+            for system in _param_order(param_lists, "system", benchmark_pivot.systems):
+                row = system_idx[system]
+                for argument in arguments:
+                    col = argument_idx[argument]
+                    if math.isnan(values[row, col]): continue
+
+                    key = system if single_argument else argument
+                    if key == "N/A": key = ""
+
+                    system_XY[system][key] = values[row, col].item()
+                    system_CI[system][key] = CIs[row, col].item()
+                    if first:
+                        title, scale, proportion = benchmark_pivot.metadata[argument]
+                        lower_better = proportion == "LIB"
+                        first = False
+        else:
+            for entry in Matrix.all_records(params, param_lists):
+                key = entry.params.system if single_argument else entry.results.Arguments
+                if key == "N/A": key = ""
+
+                system_XY[entry.params.system][key] = entry.results.Data_Value
+                system_CI[entry.params.system][key] = entry.results.Data_Ci
+                if first:
+                    title = entry.results.Description
+                    scale = entry.results.Scale
+                    lower_better = entry.results.Proportion == "LIB"
+                    first = False
 
         if system_highlight != "---" and cfg.get("first", "") == "y":
             val = system_XY.pop(system_highlight)
             system_XY[system_highlight] = val
 
+        show_ci = cfg.get("ci", "y") == "y"
+        ref_XY = system_XY.get(system_highlight, {})
+        ref_CI = system_CI.get(system_highlight, {})
+
+        has_different = False
         data = []
         for system, XY in system_XY.items():
-            text = [f"{x:.2f} {scale}" for x in XY.values()]
+            CI = system_CI[system]
+            text = []
+            for key, x in XY.items():
+                # '*': the confidence intervals of this system and of the highlighted one don't overlap
+                ref_key = system_highlight if single_argument else key
+                different = system != system_highlight and ref_key in ref_XY \
+                    and trials.significantly_different(x, CI[key], ref_XY[ref_key], ref_CI[ref_key])
+                text.append(f"{x:.2f} {scale}{' *' if different else ''}")
+                has_different |= different
+
+            error_x = dict(type="data", array=[None if math.isnan(ci) else ci for ci in CI.values()]) \
+                if show_ci else None
 
             if system_highlight == system:
                 color = "darkcyan"
@@ -77,6 +142,7 @@ class Plot():
                             y=list(XY.keys()), x=list(XY.values()), text=text,
                             textfont_size=25,
                             marker_color=color,
+                            error_x=error_x,
                             hoverlabel= {'namelength' :-1},
                             orientation="h")]
 
@@ -86,6 +152,8 @@ class Plot():
             title += f"<br>{params['argument']}"
         if system_highlight != "---" and not single_argument:
             title += f"<br>system: {system_highlight}"
+        if has_different:
+            title += f"<br><sup>*: 95% confidence interval not overlapping with {system_highlight}'s</sup>"
 
         xaxis_title = f"⇦ {scale}, fewer is better" if lower_better else f"⇨ {scale}, more is better"
         fig.update_layout(title=title, title_x=0.5,
@@ -0,0 +1,191 @@
+import math
+
+import numpy as np
+import plotly.graph_objs as go
+from plotly.subplots import make_subplots
+
+import matrix_benchmarking.plotting.table_stats as table_stats
+from matrix_benchmarking.common import Matrix
+
+from plugins.phoronix import pivot
+from plugins.shared import figure_cache
+
+# default number of worst regressions and best improvements shown
+DEFAULT_TOP = 10
+
+class GeomeanComparison():
+    """
+    Compares the systems with a reference system over all the
+    benchmarks: the ratio of each result with the result of the
+    reference, oriented so that a ratio above 1 is an improvement
+    whatever the Proportion (LIB/HIB) of the benchmark, the geometric
+    mean of the ratios of each system, and the worst regressions and
+    best improvements.
+
+    The confidence intervals are propagated from the 95% confidence
+    intervals of the trial samples of the results.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.id_name = name.lower().replace(" ", "_")
+
+        table_stats.TableStats._register_stat(self)
+        Matrix.settings["stats"].add(self.name)
+
+    def do_hover(self, meta_value, variables, figure, data, click_info):
+        return "nothing"
+
+    @figure_cache.cached
+    def do_plot(self, ordered_vars, params, param_lists, variables, cfg):
+        reference = params["system"]
+        if reference == "---":
+            return {}, "Please select the reference system"
+
+        if cfg.get("compare"):
+            systems = [cfg["compare"]]
+        else:
+            # sorted, so that the order of the systems doesn't depend on the set
+            systems = sorted((system for system in Matrix.settings["system"] if system != reference), key=str)
+
+        try:
+            top = max(int(cfg.get("top", DEFAULT_TOP)), 1)
+        except ValueError:
+            top = DEFAULT_TOP
+
+        columns = _collect(reference, systems, params.get("repeat", "---"))
+        if columns is None:
+            return {}, f"No result to compare with {reference}"
+
+        system_codes, labels, value, ci, ref_value, ref_ci, lower_better = columns
+
+        valid = (value > 0) & (ref_value > 0)
+        system_codes, labels = system_codes[valid], labels[valid]
+        value, ci, ref_value, ref_ci = value[valid], ci[valid], ref_value[valid], ref_ci[valid]
+
+        # log of the ratios, positive when the system is better than the reference
+        log_ratio = np.log(value / ref_value)
+        log_ratio[lower_better[valid]] *= -1
+
+        # first order propagation of the relative confidence intervals,
+        # the results without trial samples have no interval
+        log_ci = np.sqrt((ci / value)**2 + (ref_ci / ref_value)**2)
+        log_ci_sq = np.where(np.isnan(log_ci), 0, log_ci**2)
+
+        count = np.bincount(system_codes, minlength=len(systems))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_log = np.bincount(system_codes, weights=log_ratio, minlength=len(systems)) / count
+            mean_log_ci = np.sqrt(np.bincount(system_codes, weights=log_ci_sq, minlength=len(systems))) / count
+        mean_log_ci[mean_log_ci == 0] = np.nan
+
+        # the 95% confidence interval of the geometric mean doesn't include 1
+        different = np.abs(mean_log) > mean_log_ci
+
+        fig = make_subplots(rows=2, cols=1, vertical_spacing=0.1,
+                            subplot_titles=["Geometric mean of the ratios",
+                                            f"Worst regressions and best improvements (top {top})"])
+
+        shown = [idx for idx in range(len(systems)) if count[idx]]
+        geomean = [_percent(mean_log[idx]) for idx in shown]
+        fig.add_trace(go.Bar(name="geomean",
+                             y=[f"{systems[idx]} ({count[idx]} results)" for idx in shown],
+                             x=geomean,
+                             text=[f"{x:+.2f} %{' *' if different[idx] else ''}"
+                                   for x, idx in zip(geomean, shown)],
+                             error_x=_error_x(mean_log[shown], mean_log_ci[shown]),
+                             marker_color=["darkgreen" if x >= 0 else "darkred" for x in geomean],
+                             hoverlabel={'namelength' :-1},
+                             orientation="h"), row=1, col=1)
+
+        order = np.argsort(log_ratio, kind="stable")
+        extremes = np.concatenate([order[:top], order[max(top, len(order) - top):]]) \
+            if len(order) > 2 * top else order
+
+        names = [f"{systems[code]}: {label}" for code, label in zip(system_codes[extremes], labels[extremes])] \
+            if len(shown) > 1 else labels[extremes].tolist()
+        changes = [_percent(x) for x in log_ratio[extremes]]
+        fig.add_trace(go.Bar(name="results",
+                             y=names, x=changes,
+                             text=[f"{x:+.2f} %" for x in changes],
+                             error_x=_error_x(log_ratio[extremes], log_ci[extremes]),
+                             marker_color=["darkgreen" if x >= 0 else "darkred" for x in changes],
+                             hoverlabel={'namelength' :-1},
+                             orientation="h"), row=2, col=1)
+
+        title = f"Comparison with {reference}, over {len(log_ratio)} results"
+        if different[shown].any():
+            title += "<br><sup>*: 95% confidence interval of the geometric mean not including 0</sup>"
+
+        fig.update_layout(title=title, title_x=0.5,
+                          showlegend=False,
+                          height=400 + 25 * (len(shown) + len(extremes)),
+                          paper_bgcolor='rgb(248, 248, 255)',
+                          plot_bgcolor='rgb(248, 248, 255)',
+                          )
+        fig.update_xaxes(title="⇨ % of improvement", ticksuffix=" %",
+                         showline=True, linewidth=2, linecolor='gray',
+                         showgrid=True, gridwidth=2, gridcolor='darkgray')
+        fig.update_yaxes(showline=True, linewidth=2, linecolor='gray', showgrid=False,
+                         autorange="reversed")
+
+        return fig, ""
+
+def _collect(reference, systems, repeat):
+    """
+    Gathers the results of `systems` and of the `reference` system over
+    all the benchmarks of the pivot index, as flat arrays with one row
+    per (system, benchmark, argument): the index of the system in
+    `systems`, the label of the benchmark and argument, the value and
+    ci of the system and of the reference, and whether lower is better.
+
+    Returns None if no result has a reference value.
+    """
+
+    columns = [[] for _ in range(7)]
+    for benchmark in pivot.benchmarks():
+        benchmark_pivot = pivot.get(benchmark)
+        if reference not in benchmark_pivot.systems:
+            continue
+
+        values, CIs = benchmark_pivot.select(repeat)
+        ref_row = benchmark_pivot.systems.index(reference)
+
+        labels = np.array([benchmark if argument == "N/A" else f"{benchmark} {argument}"
+                           for argument in benchmark_pivot.arguments], dtype=object)
+        lower_better = np.array([benchmark_pivot.metadata[argument][2] == "LIB"
+                                 for argument in benchmark_pivot.arguments])
+
+        for code, system in enumerate(systems):
+            if system not in benchmark_pivot.systems:
+                continue
+
+            row = benchmark_pivot.systems.index(system)
+            for column, array in zip(columns, (np.full(len(labels), code), labels,
+                                               values[row], CIs[row], values[ref_row], CIs[ref_row],
+                                               lower_better)):
+                column.append(array)
+
+    if not columns[0]:
+        return None
+
+    system_codes, labels, value, ci, ref_value, ref_ci, lower_better = map(np.concatenate, columns)
+
+    # the NaN values (no result) are dropped
+    has_values = ~(np.isnan(value) | np.isnan(ref_value))
+
+    return (system_codes[has_values], labels[has_values], value[has_values], ci[has_values],
+            ref_value[has_values], ref_ci[has_values], lower_better[has_values])
+
+def _percent(log_ratio):
+    return (math.exp(log_ratio) - 1) * 100
+
+def _error_x(log_ratio, log_ci):
+    """Asymmetric error bars, in %, of the ratios from the half-width of their log confidence interval."""
+
+    has_ci = ~np.isnan(log_ci)
+    upper = np.where(has_ci, (np.exp(log_ratio + log_ci) - np.exp(log_ratio)) * 100, np.nan)
+    lower = np.where(has_ci, (np.exp(log_ratio) - np.exp(log_ratio - log_ci)) * 100, np.nan)
+
+    return dict(type="data", symmetric=False,
+                array=[None if math.isnan(x) else x for x in upper.tolist()],
+                arrayminus=[None if math.isnan(x) else x for x in lower.tolist()])
@@ -0,0 +1,86 @@
+"""
+Compact records of the Phoronix results stored in the matrix, and the
+references to the Result elements they were parsed from.
+"""
+
+import xml.etree.ElementTree as ET
+
+from plugins.phoronix import lazy
+
+class ResultRecord():
+    """Fields of one Result element, and the statistics of its trial samples."""
+
+    __slots__ = ("Identifier", "Title", "AppVersion", "Arguments", "Description",
+                 "Scale", "Proportion", "DisplayFormat",
+                 "Data_Identifier", "Data_Value", "Data_RawString",
+                 "Data_Samples", "Data_RunTimes",
+                 "Data_Mean", "Data_Stdev", "Data_Min", "Data_Max", "Data_Median", "Data_Ci")
+
+    def fields(self):
+        """Returns the {field: value} dict of the fields set."""
+
+        return {key: getattr(self, key) for key in ResultRecord.__slots__ if hasattr(self, key)}
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.fields()})"
+
+
+class ResultRef():
+    """
+    Reference to a Result element of a composite file: its index among
+    the Result elements of the file, and its byte range if it is known,
+    along with the lazy.ScannedFile state of the file it is valid for.
+    The element is only parsed when `element()` is called.
+    """
+
+    __slots__ = ("path", "index", "span", "scanned")
+
+    def __init__(self, path, index, span=None, scanned=None):
+        self.path = path
+        self.index = index
+        self.span = span
+        self.scanned = scanned
+
+    def element(self):
+        if self.span is not None:
+            return next(lazy.read_results(self.path, [self.span], self.scanned))
+
+        results = (elt for elt in iter_children(self.path) if elt.tag == "Result")
+        for idx, elt in enumerate(results):
+            if idx == self.index:
+                return elt
+
+        raise IndexError(f"No Result #{self.index} in {self.path}")
+
+    def __str__(self):
+        return f"{self.path}#{self.index}"
+
+    def __repr__(self):
+        return f"ResultRef({self})"
+
+
+def iter_children(fname):
+    """
+    Yields the children of the root element of `fname` as they are
+    closed, without building the DOM of the whole file.
+
+    The children are detached from the root once they've been
+    processed, so only those still referenced stay in memory.
+    """
+
+    root = None
+    depth = 0
+    for event, elt in ET.iterparse(fname, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elt
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth != 1:
+            continue
+
+        yield elt
+
+        del root[:]
@@ -1,13 +1,46 @@
-import types, datetime
+import datetime, json
 import yaml
-import os, pathlib
+import os, pathlib, fnmatch
+import concurrent.futures
 
 import matrix_benchmarking.store as store
 import matrix_benchmarking.common as common
 
+from plugins.phoronix import trials
+from plugins.phoronix import dataset
+from plugins.phoronix import lazy
+from plugins.phoronix import records as result_records
+from plugins.phoronix import pivot
+from plugins.shared import figure_cache
+
 
 import xml.etree.ElementTree as ET
 
+# optional file of the results directory overriding DEFAULT_IMPORT_SETTINGS
+IMPORT_SETTINGS_FILE = "import_settings.yaml"
+
+DUPLICATE_POLICIES = "keep-all", "keep-first", "keep-last", "fail"
+
+DEFAULT_IMPORT_SETTINGS = {
+    # number of processes parsing the composite files, 0 for one per CPU
+    "workers": 1,
+    # what to do with the results of a system with the same benchmark and argument,
+    # one of DUPLICATE_POLICIES. 'keep-all' imports them with increasing repeat numbers.
+    "duplicates": "keep-all",
+    # max number of results with the same key, with 'keep-all'
+    "max_repeats": 10,
+    # globs of the directories to import, relative to the results directory (all if empty)
+    "include": [],
+    # globs of the directories not to walk, relative to the results directory
+    "exclude": ["*psap*", "*gce*"],
+    # compile the results into a columnar dataset (dataset.DATASET_FILENAME),
+    # and only parse again the composite files which changed
+    "dataset": False,
+    # only read the keys of the results at import time,
+    # the results are parsed when they're first accessed
+    "lazy": False,
+}
+
 def _parse_generated(dirname, fname, elt):
     for key in "Title", "TestClient", "Description":
         value = elt.find(key).text
@@ -19,62 +52,129 @@ def _parse_system(dirname, fname, elt):
         value = elt.find(key).text
         #print(f"{key}: {value}")
 
+def _location_str(location):
+    try:
+        return ET.tostring(location.element()).decode("ascii")
+    except Exception as e:
+        return f"{location} ({e.__class__.__name__}: {e})"
+
 def _duplicated_entry(import_key, old_location, new_location):
     print(f"WARNING: duplicated results key: {import_key}")
     print(f"WARNING:   old:")
-    print(ET.tostring(old_location).decode("ascii"))
-    print(f"WARNING:   new: {new_location}")
-    print(ET.tostring(new_location).decode("ascii"))
-    import pdb;pdb.set_trace()
-    pass
+    print(_location_str(old_location))
+    print(f"WARNING:   new:")
+    print(_location_str(new_location))
 
 def _parse_result(dirname, fname, elt):
-    results = types.SimpleNamespace()
+    results = result_records.ResultRecord()
 
     for key in "Identifier", "Title", "AppVersion", "Arguments", \
         "Description", "Scale", "Proportion", "DisplayFormat":
         if elt.find(key) is None:
-            results.__dict__[key] = "missing"
+            setattr(results, key, "missing")
         elif not elt.find(key).text:
-            results.__dict__[key] = "N/A"
+            setattr(results, key, "N/A")
         else:
-            results.__dict__[key] = elt.find(key).text
+            setattr(results, key, elt.find(key).text)
 
 
     for key in "Identifier", "Value", "RawString":
-        results.__dict__[f"Data_{key}"]  = elt.find("Data").find("Entry").find(key).text
+        setattr(results, f"Data_{key}", elt.find("Data").find("Entry").find(key).text)
 
     if results.Data_Value is None:
         #print(elt.find("Data").find("Entry").find("JSON").text)
-        return
+        return None
 
     results.Data_Value = float(results.Data_Value)
 
+    source = f"{dirname}/{fname} {results.Title} {results.Arguments}"
+    results.Data_Samples = trials.parse_samples(results.Data_RawString, source)
+
+    json_elt = elt.find("Data").find("Entry").find("JSON")
+    try:
+        run_times = json.loads(json_elt.text).get("test-run-times")
+    except (AttributeError, TypeError, ValueError):
+        run_times = None
+    results.Data_RunTimes = trials.parse_samples(run_times if isinstance(run_times, str) else None,
+                                                 f"{source} (run times)")
+
+    return results
+
+def _compute_trial_stats(all_results):
+    """Computes the statistics of the trial samples of `all_results` in one pass."""
+
+    if not all_results:
+        return
+
+    stats = trials.compute_stats([results.Data_Samples for results in all_results])
+    for key in "mean", "stdev", "min", "max", "median", "ci":
+        for results, value in zip(all_results, stats[key].tolist()):
+            setattr(results, f"Data_{key.title()}", value)
+
+def _result_key(dirname, results):
     benchmark = results.Title
     if results.AppVersion != "N/A":
         benchmark += " " + results.AppVersion
+
+    return dirname, benchmark, results.Arguments
+
+def _select_duplicates(records, policy, max_repeats):
+    """
+    Assigns the repeat slot of the (result_key, location, results) `records`,
+    and applies the duplicate `policy` to the records with the same
+    result key. Yields the (result_key, location, results, repeat) of the
+    records kept.
+    """
+
+    dropped = 0
+    if policy == "fail":
+        # checked before yielding any record, so that nothing is added to the matrix
+        records = list(records)
+        seen = set()
+        for result_key, _, _ in records:
+            if result_key in seen:
+                raise RuntimeError(f"Found duplicated results for {result_key}")
+            seen.add(result_key)
+
+    elif policy == "keep-last":
+        records = list(records)
+        last_idx = {result_key: idx for idx, (result_key, _, _) in enumerate(records)}
+        dropped = len(records) - len(last_idx)
+        records = [record for idx, record in enumerate(records) if last_idx[record[0]] == idx]
+
+    repeat_slots = {} # result_key -> next free repeat slot
+    for result_key, location, results in records:
+        repeat = repeat_slots.get(result_key, 0)
+        if repeat:
+            if policy == "keep-first":
+                dropped += 1
+                continue
+            if repeat >= max_repeats:
+                raise RuntimeError(f"Found {max_repeats} duplicated results for {result_key}. Is that correct?")
+
+        repeat_slots[result_key] = repeat + 1
+
+        yield result_key, location, results, repeat
+
+    if dropped:
+        print(f"INFO: {dropped} duplicated results dropped ({policy})")
+
+def _add_result(result_key, location, results, repeat):
+    system, benchmark, argument = result_key
     entry_import_settings = {
-        "system": dirname,
+        "system": system,
         "benchmark": benchmark,
-        "argument": results.Arguments,
+        "argument": argument,
         #"id": results.Identifier,
-        "repeat": 0,
+        "repeat": repeat,
     }
 
+    store.add_to_matrix(entry_import_settings, location, results, _duplicated_entry)
 
-    for i in range(0, 10):
-        import_key = common.Matrix.settings_to_key(entry_import_settings)
-        if import_key not in common.Matrix.import_map:
-            break
-        entry_import_settings["repeat"] += 1
-    else:
-        raise RuntimeError("Found 10 duplicated results. Is that correct?")
-
-    store.add_to_matrix(entry_import_settings, elt, results, _duplicated_entry)
+    pivot.add(system, benchmark, argument, repeat, results)
 
-def _parse_unknown(*args, **kwargs):
-    import pdb;pdb.set_trace()
-    pass
+def _parse_unknown(dirname, fname, elt):
+    print(f"WARNING: {dirname}/{fname}: unexpected <{elt.tag}> element, ignored")
 
 PARSERS = {
     "Generated": _parse_generated,
@@ -82,19 +182,269 @@ PARSERS = {
     "Result": _parse_result
 }
 
+def _parse_composite_file(dirname, path):
+    """
+    Parses the `path` composite file. Returns the list of the
+    (ResultRef, ResultRecord) records of its results, in the order of
+    the file.
+    """
+
+    file_records = []
+    result_idx = 0
+    for elt in result_records.iter_children(path):
+        results = PARSERS.get(elt.tag, _parse_unknown)(dirname, path.name, elt)
+        if results is not None:
+            file_records.append((result_records.ResultRef(path, result_idx), results))
+
+        if elt.tag == "Result":
+            result_idx += 1
+
+    _compute_trial_stats([results for _, results in file_records])
+
+    return file_records
+
+class LazyResult(result_records.ResultRecord):
+    """
+    Results of a Result element imported in lazy mode. Only the fields
+    of its header are set at import time. The element is parsed the
+    first time one of its other fields is accessed, along with the
+    other results of its `group` (same file and benchmark).
+    """
+
+    __slots__ = ("_lazy_ref",)
+
+    def __init__(self, dirname, location, header, group):
+        self._lazy_ref = dirname, location, group
+        for key, value in header.fields.items():
+            setattr(self, key, "missing" if value is None else (value or "N/A"))
+
+    def __getattr__(self, name):
+        # only called for the fields not set
+        if name.startswith("__") or name == "_lazy_ref" or self._lazy_ref is None:
+            raise AttributeError(name)
+
+        try:
+            _load_lazy_results(self._lazy_ref[-1])
+        except Exception as e:
+            # hasattr and getattr with a default expect an AttributeError
+            raise AttributeError(f"{name}: failed to load the results of {self._lazy_ref[1]}: "
+                                 f"{e.__class__.__name__}: {e}") from e
+
+        return getattr(self, name)
+
+def _load_lazy_results(group):
+    """Parses the LazyResults of `group` not loaded yet, and computes their statistics in one pass."""
+
+    pending = [lazy_results for lazy_results in group if lazy_results._lazy_ref is not None]
+    if not pending:
+        return
+
+    dirname, location, _ = pending[0]._lazy_ref
+    path = location.path
+    ranges = [lazy_results._lazy_ref[1].span for lazy_results in pending]
+
+    all_results = []
+    for lazy_results, elt in zip(pending, lazy.read_results(path, ranges, location.scanned)):
+        results = _parse_result(dirname, path.name, elt)
+        if results is None:
+            raise ValueError(f"No value in the result at {lazy_results._lazy_ref[1]}")
+        all_results.append(results)
+
+    _compute_trial_stats(all_results)
+
+    for lazy_results, results in zip(pending, all_results):
+        for key, value in results.fields().items():
+            setattr(lazy_results, key, value)
+        lazy_results._lazy_ref = None
+
+def _scan_composite_file(dirname, path):
+    """
+    Scans the `path` composite file in lazy mode. Returns the list of
+    the (ResultRef, LazyResult) records of its results, in the order
+    of the file.
+    """
+
+    file_records = []
+    groups = {} # (Title, AppVersion) -> LazyResults of the benchmark
+    scanned, headers = lazy.scan_results(path)
+    for result_idx, header in enumerate(headers):
+        if not header.has_value:
+            continue
+
+        location = result_records.ResultRef(path, result_idx, (header.start, header.end), scanned)
+
+        group = groups.setdefault((header.fields["Title"], header.fields["AppVersion"]), [])
+        lazy_results = LazyResult(dirname, location, header, group)
+        group.append(lazy_results)
+
+        file_records.append((location, lazy_results))
+
+    return file_records
+
+def _parse_composite_files(composite_files, workers, lazy_mode=False):
+    """
+    Yields the records of each of the (dirname, path, stat) `composite_files`,
+    in the order of the list.
+
+    In `lazy_mode`, the files are only scanned for the headers of
+    their results.
+
+    With more than one worker, the files are parsed in a pool of
+    processes, which return the records of each file. The records of a
+    file are yielded as soon as it and the files before it have been
+    parsed. If a worker fails, the remaining files are parsed serially.
+    """
+
+    parse_file = _scan_composite_file if lazy_mode else _parse_composite_file
+
+    done = 0
+    if workers > 1 and len(composite_files) > 1:
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                for file_records in executor.map(parse_file,
+                                                 [dirname for dirname, _, _ in composite_files],
+                                                 [path for _, path, _ in composite_files]):
+                    yield file_records
+                    done += 1
+        except Exception as e:
+            print(f"WARNING: parallel import failed ({e.__class__.__name__}: {e}), "
+                  f"parsing the {len(composite_files) - done} remaining files serially ...")
+
+    for dirname, path, _ in composite_files[done:]:
+        yield parse_file(dirname, path)
+
+def _load_composite_files(results_dir, composite_files, workers):
+    """
+    Returns the records of each of the (dirname, path, stat)
+    `composite_files`, like `_parse_composite_files`, but only parses
+    the files which changed since the dataset of `results_dir` was
+    saved. The others are loaded from the dataset.
+
+    The dataset is saved again if any file changed, including only its
+    size or mtime, so that the files touched aren't hashed again at
+    the next import.
+    """
+
+    known = dataset.Dataset(results_dir)
+
+    file_infos = []
+    to_parse = []
+    infos_changed = False
+    for dirname, path, stat in composite_files:
+        relpath = os.path.relpath(path, results_dir)
+        info = dataset.FileInfo.from_stat(stat)
+        if relpath in known.files:
+            known_info = known.files[relpath][0]
+            infos_changed |= (known_info.size, known_info.mtime_ns) != (info.size, info.mtime_ns)
+
+        if not known.is_valid(relpath, info):
+            if info.hash is None:
+                info.hash = dataset.file_hash(path)
+            to_parse.append((dirname, path, stat))
+
+        file_infos.append((relpath, info))
+
+    if to_parse:
+        print(f"INFO: parsing {len(to_parse)}/{len(composite_files)} composite files "
+              "missing from the dataset ...")
+
+    parsed = dict(zip((path for _, path, _ in to_parse), _parse_composite_files(to_parse, workers)))
+
+    file_records = []
+    for (dirname, path, _), (relpath, info) in zip(composite_files, file_infos):
+        records = parsed[path] if path in parsed else known.records(relpath)
+        file_records.append((relpath, info, records))
+
+    if parsed or infos_changed or set(known.files) != {relpath for relpath, _ in file_infos}:
+        dataset.write(results_dir, file_records)
+
+    return [records for _, _, records in file_records]
+
+def _discover_composite_files(results_dir, include, exclude):
+    """
+    Returns the (dirname, path, stat) list of the composite files of
+    `results_dir`, in the order of a depth-first walk with the entries
+    sorted by name.
+
+    The directories whose path (relative to `results_dir`) matches one
+    of the `exclude` globs are not walked. If `include` globs are
+    given, only the composite files of the directories matching one of
+    them are returned.
+    """
+
+    composite_files = []
+
+    def walk(this_dir, relpath):
+        try:
+            entries = sorted(os.scandir(this_dir), key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"WARNING: cannot list '{this_dir}': {e}")
+            return
+
+        included = not include or any(fnmatch.fnmatch(relpath, pattern) for pattern in include)
+
+        subdirs = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry)
+            elif included and entry.name == "composite.xml" and entry.is_file():
+                dirname = relpath.replace("single-threaded", "").strip("-/")
+                composite_files.append((dirname, pathlib.Path(entry.path), entry.stat()))
+
+        for entry in subdirs:
+            entry_relpath = f"{relpath}/{entry.name}" if relpath else entry.name
+            if any(fnmatch.fnmatch(entry_relpath, pattern) for pattern in exclude):
+                continue
+
+            walk(entry.path, entry_relpath)
+
+    walk(results_dir, "")
+
+    return composite_files
+
+def _load_import_settings(results_dir):
+    import_settings = dict(DEFAULT_IMPORT_SETTINGS)
+
+    fname = pathlib.Path(results_dir) / IMPORT_SETTINGS_FILE
+    if fname.exists():
+        with open(fname) as f:
+            import_settings.update(yaml.safe_load(f) or {})
+
+    return import_settings
+
 def parse_data(results_dir):
     store.register_custom_rewrite_settings(lambda x : x)
+    pivot.clear()
+    figure_cache.invalidate()
+
+    import_settings = _load_import_settings(results_dir)
+    workers = import_settings["workers"] or os.cpu_count()
+
+    if import_settings["duplicates"] not in DUPLICATE_POLICIES:
+        raise ValueError(f"Invalid duplicates policy '{import_settings['duplicates']}', "
+                         f"expected one of {', '.join(DUPLICATE_POLICIES)}")
+
+    composite_files = _discover_composite_files(results_dir, import_settings["include"],
+                                                import_settings["exclude"])
+
+    if import_settings["dataset"]:
+        if import_settings["lazy"]:
+            print("WARNING: the lazy mode isn't used with the dataset, which stores the full results")
+        all_file_records = _load_composite_files(results_dir, composite_files, workers)
+    else:
+        all_file_records = _parse_composite_files(composite_files, workers,
+                                                  lazy_mode=import_settings["lazy"])
 
-    path = os.walk(results_dir)
+    # the records are merged in the order of the walk,
+    # so that the repeat numbers don't depend on the workers
+    records = ((_result_key(dirname, results), location, results)
+               for (dirname, _, _), file_records in zip(composite_files, all_file_records)
+               for location, results in file_records)
 
-    for this_dir, directories, files in path:
-        dirname = this_dir.replace(results_dir, "").strip("/")
-        dirname = dirname.replace("single-threaded", "").strip("-/")
-        if "psap"  in dirname or "gce" in dirname: continue
-        for fname in files:
-            if fname != "composite.xml": continue
-            root = ET.parse(pathlib.Path(this_dir) / fname).getroot()
-            for elt in root:
+    for result_key, location, results, repeat in _select_duplicates(records, import_settings["duplicates"],
+                                                                    import_settings["max_repeats"]):
+        _add_result(result_key, location, results, repeat)
 
-                PARSERS.get(elt.tag, _parse_unknown)(dirname, fname, elt)
-                pass
+    if not import_settings["lazy"] or import_settings["dataset"]:
+        # in lazy mode, the pivot of a benchmark is only built when it's plotted
+        pivot.build_all()
@@ -0,0 +1,106 @@
+"""
+Statistics of the trial samples of the Phoronix results, computed in
+one vectorized pass over all the results of a composite file.
+"""
+
+import warnings
+
+import numpy as np
+
+# two-sided 95% critical values of the Student t distribution,
+# indexed by the degrees of freedom
+T_975 = np.array([np.nan,
+                  12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+                  2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+                  2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042])
+
+Z_975 = 1.960
+
+def parse_samples(text, source=None):
+    """
+    Parses a `3.813:4.116:3.907` string of trial samples into a float
+    array. The values which aren't numbers are skipped, with a warning
+    naming their `source`.
+    """
+
+    if not text:
+        return np.empty(0)
+
+    values = [value for value in text.split(":") if value]
+    try:
+        return np.array(values, dtype=np.float64)
+    except ValueError:
+        pass
+
+    samples = []
+    invalid = []
+    for value in values:
+        try:
+            samples.append(float(value))
+        except ValueError:
+            invalid.append(value)
+
+    print(f"WARNING: {source or 'trial samples'}: invalid samples ignored: {', '.join(map(repr, invalid))}")
+
+    return np.array(samples, dtype=np.float64)
+
+
+def t_975(df):
+    """Student t critical values of the `df` array of degrees of freedom."""
+
+    df = np.asarray(df)
+    in_table = df < len(T_975)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # first order expansion of t around the normal distribution
+        large_df = Z_975 + (Z_975**3 + Z_975) / (4 * df)
+
+    return np.where(in_table, T_975[np.clip(df, 0, len(T_975) - 1)], large_df)
+
+
+def compute_stats(samples):
+    """
+    Computes the statistics of the list of `samples` arrays. Returns a
+    dict of arrays with one value per array of samples: count, mean,
+    stdev, min, max, median, and ci, the half-width of the 95%
+    confidence interval of the mean.
+
+    The statistics which can't be computed (no samples, or a single
+    one for the stdev and the ci) are NaN.
+    """
+
+    count = np.fromiter(map(len, samples), dtype=np.int64, count=len(samples))
+    width = int(count.max()) if len(samples) else 0
+
+    # one row per array of samples, padded with NaN
+    padded = np.full((len(samples), max(width, 1)), np.nan)
+    if width:
+        padded[np.arange(width) < count[:, None]] = np.concatenate(samples)
+
+    with warnings.catch_warnings():
+        # rows without enough samples
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+
+        mean = np.nanmean(padded, axis=1)
+        stdev = np.nanstd(padded, axis=1, ddof=1)
+        stats = dict(
+            count=count,
+            mean=mean,
+            stdev=stdev,
+            min=np.nanmin(padded, axis=1),
+            max=np.nanmax(padded, axis=1),
+            median=np.nanmedian(padded, axis=1),
+        )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stats["ci"] = t_975(count - 1) * stdev / np.sqrt(count)
+
+    return stats
+
+
+def significantly_different(value, ci, ref_value, ref_ci):
+    """Tells if the confidence intervals of the two values don't overlap."""
+
+    if ci is None or ref_ci is None or np.isnan(ci) or np.isnan(ref_ci):
+        return False
+
+    return abs(value - ref_value) > ci + ref_ci
@@ -8,6 +8,8 @@ import matrix_benchmarking.plotting.table_stats as table_stats
 from matrix_benchmarking.common import Matrix
 from matrix_benchmarking.plotting.ui import COLORS
 
+from plugins.shared import figure_cache
+
 def register():
     Plot("Date")
     Plot("Memfree")
@@ -24,6 +26,7 @@ class Plot():
     def do_hover(self, meta_value, variables, figure, data, click_info):
         return "nothing"
 
+    @figure_cache.cached
     def do_plot(self, ordered_vars, settings, param_lists, variables, cfg):
         fig = go.Figure()
 
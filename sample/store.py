@@ -4,6 +4,8 @@ import yaml
 import matrix_benchmarking.store as store
 import matrix_benchmarking.store.simple as store_simple
 
+from plugins.shared import figure_cache
+
 def _rewrite_settings(params_dict):
     # add a @ on top of parameter name 'run'
     # to treat it as multiple identical executions
@@ -73,5 +75,6 @@ def parse_data():
     # delegate the parsing to the simple_store
     store.register_custom_rewrite_settings(_rewrite_settings)
     store_simple.register_custom_parse_results(_parse_directory)
+    figure_cache.invalidate()
 
     return store_simple.parse_data()
@@ -0,0 +1,338 @@
+#! /usr/bin/python3
+
+"""
+Headless export of the plots of a workload: the store is loaded, the
+plots are registered, and all the registered stats (or those selected)
+are rendered over a sweep of parameters, in a pool of worker
+processes. Each figure is saved as HTML (and PNG with --png, which
+requires the `kaleido` package), and an index.html page links them all.
+
+The reports (the stats with `no_graph`), and the stats returning Dash
+components instead of a figure, are saved as HTML pages.
+
+Must run in an environment where MatrixBenchmarking is importable.
+
+Usage: export.py WORKLOAD RESULTS_DIR OUTPUT_DIR
+                 [--stats NAME,...] [--sweep KEY[=VALUE,...]]... [--set KEY=VALUE]...
+                 [--cfg KEY=VALUE]... [--workers N] [--png] [--standalone]
+
+--sweep KEY renders the stats for each value of the KEY parameter,
+--sweep KEY=V1,V2 only for these values.
+"""
+
+import os
+import re
+import sys
+import html
+import inspect
+import hashlib
+import pathlib
+import argparse
+import datetime
+import importlib
+import itertools
+import concurrent.futures
+import multiprocessing
+import importlib.util
+
+# imported from this directory, the plugins package may not exist yet
+from plugins_package import import_plugins_package
+
+INDEX_FILENAME = "index.html"
+PLOTLY_JS_FILENAME = "plotly.min.js"
+
+WORKLOADS = {
+    # name: (store module, plot module, Matrix module, TableStats module, environment)
+    "phoronix": ("plugins.phoronix.store", "plugins.phoronix.plot",
+                 "matrix_benchmarking.common", "matrix_benchmarking.plotting.table_stats", {}),
+    "sample": ("plugins.sample.store", "plugins.sample.plotting",
+               "matrix_benchmarking.common", "matrix_benchmarking.plotting.table_stats", {}),
+    # the watch mode would never let the export finish
+    "mlperf": ("plugins.mlperf.store", "plugins.mlperf.plot",
+               "common", "matrix_view.table_stats", {"MATBENCH_MLPERF_WATCH": "0"}),
+}
+
+# props of the Dash components which aren't HTML attributes
+DASH_ONLY_PROPS = {"children", "key", "loading_state", "setProps",
+                   "n_clicks", "n_clicks_timestamp", "disable_n_clicks"}
+# HTML names of the React props, the other ones are only lowercased (colSpan -> colspan)
+HTML_ATTRIBUTES = {"className": "class", "htmlFor": "for"}
+# HTML elements without closing tag
+VOID_TAGS = {"area", "br", "col", "embed", "hr", "img", "input", "source", "track", "wbr"}
+
+# state of the export, set before the workers are forked
+_matrix = None
+_table_stats = None
+_options = None
+
+def load_workload(workload, results_dir):
+    """Parses the results of `workload` and registers its plots. Returns its Matrix and TableStats classes."""
+
+    store_module, plot_module, matrix_module, table_stats_module, env = WORKLOADS[workload]
+    os.environ.update(env)
+
+    import_plugins_package()
+
+    store = importlib.import_module(store_module)
+    if inspect.signature(store.parse_data).parameters:
+        store.parse_data(str(results_dir))
+    else:
+        store.parse_data()
+
+    importlib.import_module(plot_module).register()
+
+    return (importlib.import_module(matrix_module).Matrix,
+            importlib.import_module(table_stats_module).TableStats)
+
+def parse_sweep(matrix, sweep_args, set_args):
+    """
+    Returns the list of the {key: value} parameter combinations of the
+    sweep, including the fixed parameters of `set_args`.
+    """
+
+    fixed = dict(arg.split("=", 1) for arg in set_args)
+
+    sweep = {}
+    for arg in sweep_args:
+        key, found, values = arg.partition("=")
+        if key not in matrix.settings:
+            raise ValueError(f"Unknown parameter '{key}'")
+
+        sweep[key] = values.split(",") if found else sorted(matrix.settings[key], key=str)
+
+    return [fixed | dict(zip(sweep, values)) for values in itertools.product(*sweep.values())]
+
+def plot_args(matrix, combination, cfg):
+    """
+    Returns the do_plot arguments of the `combination` of parameters:
+    the parameters with a single value are set, the others are
+    variables unless they're part of the combination.
+    """
+
+    params = {}
+    variables = {}
+    for key, values in matrix.settings.items():
+        if key == "stats":
+            continue
+
+        values = sorted(values, key=str)
+        if key in combination:
+            params[key] = combination[key]
+        elif len(values) == 1:
+            params[key] = values[0]
+        else:
+            params[key] = "---"
+            variables[key] = values
+
+    ordered_vars = list(variables)
+    param_lists = [[(key, value) for value in variables[key]] for key in ordered_vars]
+
+    return ordered_vars, params, param_lists, variables, dict(cfg)
+
+def output_name(stat, combination):
+    name = "--".join([stat.id_name] + [f"{key}={value}" for key, value in sorted(combination.items())])
+    name = re.sub(r"[^A-Za-z0-9._=-]+", "_", name)
+    if len(name) > 120:
+        name = name[:100] + "--" + hashlib.sha1(name.encode()).hexdigest()[:16]
+
+    return name
+
+def _style_css(style):
+    """Converts the `style` dict of a Dash component (with camelCase keys) to CSS."""
+
+    return "; ".join(re.sub("([A-Z])", r"-\1", key).lower() + f": {value}"
+                     for key, value in style.items())
+
+def _component_attributes(component):
+    """Returns the HTML attributes of the props of a Dash component."""
+
+    props = component.to_plotly_json()["props"] if hasattr(component, "to_plotly_json") else {}
+
+    attributes = ""
+    for name, value in props.items():
+        if name in DASH_ONLY_PROPS or value is None or value is False:
+            continue
+
+        if name == "style" and isinstance(value, dict):
+            value = _style_css(value)
+        elif not isinstance(value, (str, int, float)):
+            continue
+
+        name = HTML_ATTRIBUTES.get(name, name.lower())
+        attributes += f" {name}" if value is True else f' {name}="{html.escape(str(value))}"'
+
+    return attributes
+
+def _component_html(component):
+    """Converts the Dash components of a report to HTML."""
+
+    import plotly.io
+
+    if component is None:
+        return ""
+    if isinstance(component, (list, tuple)):
+        return "".join(_component_html(child) for child in component)
+    if isinstance(component, (str, int, float)):
+        return html.escape(str(component))
+
+    if type(component).__name__ == "Graph":
+        return plotly.io.to_html(component.figure, full_html=False, include_plotlyjs=False)
+
+    tag = type(component).__name__.lower()
+    attributes = _component_attributes(component)
+    if tag in VOID_TAGS:
+        return f"<{tag}{attributes}>"
+
+    return f"<{tag}{attributes}>{_component_html(getattr(component, 'children', None))}</{tag}>"
+
+def _plotly_script():
+    if _options.standalone:
+        import plotly.offline
+        return f"<script>{plotly.offline.get_plotlyjs()}</script>"
+
+    return f'<script src="{PLOTLY_JS_FILENAME}"></script>'
+
+def render(stat_name, combination):
+    """
+    Renders the `stat_name` stat with the `combination` of parameters,
+    and saves it in the output directory. Returns the description of
+    the export, for the index page.
+    """
+
+    import plotly.graph_objs as go
+
+    stat = _table_stats.stats_by_name[stat_name]
+    name = output_name(stat, combination)
+    export = dict(stat=stat_name, params=combination, files=[], message="")
+
+    try:
+        fig, msg = stat.do_plot(*plot_args(_matrix, combination, _options.cfg))
+    except Exception as e:
+        export["message"] = f"{e.__class__.__name__}: {e}"
+        return export
+
+    output_dir = _options.output_dir
+
+    if not fig and msg is not None and not isinstance(msg, str):
+        # a report, or a stat without figure, `msg` holds its Dash components
+        with open(output_dir / f"{name}.html", "w") as f:
+            f.write(f"<html><head><meta charset=\"utf-8\">{_plotly_script()}</head><body>"
+                    f"{_component_html(msg)}</body></html>")
+        export["files"].append(f"{name}.html")
+
+        return export
+
+    export["message"] = msg or ""
+    if not fig:
+        return export
+
+    if not isinstance(fig, go.Figure):
+        fig = go.Figure(fig)
+
+    # the same figure is saved in all the formats
+    fig.write_html(output_dir / f"{name}.html",
+                   include_plotlyjs=True if _options.standalone else "directory")
+    export["files"].append(f"{name}.html")
+
+    if _options.png:
+        fig.write_image(output_dir / f"{name}.png")
+        export["files"].append(f"{name}.png")
+
+    return export
+
+def write_index(output_dir, workload, exports):
+    rows = []
+    for export in exports:
+        params = ", ".join(f"{key}={value}" for key, value in sorted(export["params"].items()))
+        links = " ".join(f'<a href="{html.escape(fname)}">{html.escape(fname.rpartition(".")[-1])}</a>'
+                         for fname in export["files"])
+        rows.append(f"<tr><td>{html.escape(export['stat'])}</td><td>{html.escape(params)}</td>"
+                    f"<td>{links}</td><td>{html.escape(str(export['message']))}</td></tr>")
+
+    with open(output_dir / INDEX_FILENAME, "w") as f:
+        f.write(f"<html><head><meta charset=\"utf-8\"><title>{workload} results</title></head><body>"
+                f"<h1>{html.escape(workload)} results</h1>"
+                f"<p>Generated on {datetime.datetime.now().isoformat(timespec='seconds')}</p>"
+                "<table border=\"1\"><tr><th>Stat</th><th>Parameters</th><th>Files</th><th>Message</th></tr>"
+                + "\n".join(rows) +
+                "</table></body></html>")
+
+def export(workload, results_dir, options):
+    """Exports the stats of `workload`. Returns the list of the export descriptions."""
+
+    global _matrix, _table_stats, _options
+
+    _options = options
+    _matrix, _table_stats = load_workload(workload, results_dir)
+
+    stat_names = options.stats or sorted(_matrix.settings["stats"])
+    unknown = [stat_name for stat_name in stat_names if stat_name not in _table_stats.stats_by_name]
+    if unknown:
+        raise ValueError(f"Unknown stats: {', '.join(unknown)}")
+
+    tasks = [(stat_name, combination)
+             for stat_name in stat_names
+             for combination in parse_sweep(_matrix, options.sweep, options.set)]
+
+    options.output_dir.mkdir(parents=True, exist_ok=True)
+    if not options.standalone:
+        import plotly.offline
+        with open(options.output_dir / PLOTLY_JS_FILENAME, "w") as f:
+            f.write(plotly.offline.get_plotlyjs())
+
+    print(f"INFO: exporting {len(tasks)} plots with {options.workers} workers ...")
+
+    exports = None
+    if options.workers > 1 and len(tasks) > 1 and "fork" in multiprocessing.get_all_start_methods():
+        # the workers inherit the parsed results and the registered stats
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=options.workers,
+                                                        mp_context=multiprocessing.get_context("fork")) as executor:
+                exports = list(executor.map(render, *zip(*tasks)))
+        except concurrent.futures.process.BrokenProcessPool as e:
+            print(f"WARNING: parallel export failed ({e.__class__.__name__}: {e}), "
+                  "falling back to the serial export ...")
+
+    if exports is None:
+        exports = [render(stat_name, combination) for stat_name, combination in tasks]
+
+    write_index(options.output_dir, workload, exports)
+
+    return exports
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the plots of a workload to HTML/PNG files.")
+    parser.add_argument("workload", choices=sorted(WORKLOADS))
+    parser.add_argument("results_dir", type=pathlib.Path)
+    parser.add_argument("output_dir", type=pathlib.Path)
+    parser.add_argument("--stats", type=lambda arg: arg.split(","), default=[],
+                        help="comma-separated list of the stats to export (default: all)")
+    parser.add_argument("--sweep", action="append", default=[], metavar="KEY[=VALUE,...]",
+                        help="parameter to sweep, over all its values or those listed")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="fixed parameter value")
+    parser.add_argument("--cfg", action="append", default=[], metavar="KEY=VALUE",
+                        help="configuration of the plots")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of worker processes (default: one per CPU)")
+    parser.add_argument("--png", action="store_true",
+                        help="also save the figures as PNG (requires kaleido)")
+    parser.add_argument("--standalone", action="store_true",
+                        help=f"embed plotly.js in each HTML file, instead of sharing {PLOTLY_JS_FILENAME}")
+
+    args = parser.parse_args()
+    args.cfg = dict(arg.split("=", 1) for arg in args.cfg)
+
+    if args.png and importlib.util.find_spec("kaleido") is None:
+        print("ERROR: --png requires the 'kaleido' package")
+        return 1
+
+    exports = export(args.workload, args.results_dir, args)
+
+    failed = [export for export in exports if not export["files"]]
+    print(f"Exported {len(exports) - len(failed)}/{len(exports)} plots to {args.output_dir / INDEX_FILENAME}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""
+LRU cache of the figures generated by the `do_plot` method of the
+plots, shared by the workloads.
+
+The figures are keyed by the stat and by the normalized parameters of
+the call. The least recently used figures are evicted once their
+estimated size goes above the memory budget, set in MB with the
+MATBENCH_FIGURE_CACHE_MB environment variable (0 disables the cache).
+
+The figures are stored as plain dicts (`fig.to_dict()`), which are
+returned as they are on a cache hit: they must not be modified, build a
+`go.Figure` from them to do so. The figures are returned as dicts even
+when the cache is disabled, so that the callers get the same type in
+both cases.
+
+The stores call `invalidate()` when their results are (re)loaded, so
+that no figure of the previous results is returned.
+"""
+
+import os
+import functools
+import threading
+import collections
+
+DEFAULT_BUDGET_MB = 256
+
+# estimated size (in bytes) of the layout and the settings of a figure, and of one value of its traces
+FIGURE_SIZE = 8 * 1024
+VALUE_SIZE = 24
+
+_lock = threading.Lock()
+_figures = collections.OrderedDict() # key -> (result, size)
+_size = 0
+_generation = 0 # bumped by invalidate()
+
+def budget():
+    return int(float(os.environ.get("MATBENCH_FIGURE_CACHE_MB", DEFAULT_BUDGET_MB)) * 1024 * 1024)
+
+def generation():
+    """Returns the generation of the results, which changes when they're (re)loaded."""
+
+    return _generation
+
+def invalidate():
+    """Drops all the figures, the results of the stores changed."""
+
+    global _generation, _size
+
+    with _lock:
+        _generation += 1
+        _figures.clear()
+        _size = 0
+
+def _freeze(value):
+    """Returns a hashable version of `value`, independent of the order of the dicts and sets."""
+
+    if isinstance(value, dict):
+        return tuple(sorted((str(key), _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(_freeze(item) for item in value))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+
+    return str(value)
+
+def _estimate_size(result):
+    """Estimates the size of a cached result from the number of values of its traces."""
+
+    fig, msg = result
+
+    size = FIGURE_SIZE + len(str(msg))
+    if isinstance(fig, dict):
+        for trace in fig.get("data", ()):
+            for value in trace.values():
+                if hasattr(value, "__len__") and not isinstance(value, (str, dict)):
+                    size += len(value) * VALUE_SIZE
+
+    return size
+
+def _freeze_result(result):
+    fig, msg = result
+
+    return (fig.to_dict() if hasattr(fig, "to_dict") else fig), msg
+
+def _lookup(key):
+    with _lock:
+        if key not in _figures:
+            return None
+
+        _figures.move_to_end(key)
+        return _figures[key][0]
+
+def _store(key, result, generation):
+    global _size
+
+    size = _estimate_size(result)
+    max_size = budget()
+    if size > max_size:
+        return
+
+    with _lock:
+        if generation != _generation:
+            # the results were reloaded while the figure was generated
+            return
+
+        if key in _figures:
+            _size -= _figures.pop(key)[1]
+
+        _figures[key] = result, size
+        _size += size
+
+        while _size > max_size:
+            _, (_, evicted_size) = _figures.popitem(last=False)
+            _size -= evicted_size
+
+def _key(stat, ordered_vars, params, param_lists, variables, cfg):
+    return (stat.__class__.__qualname__, stat.id_name,
+            _freeze(ordered_vars), _freeze(params), _freeze(param_lists),
+            _freeze(variables), _freeze(cfg))
+
+def key(stat, ordered_vars, params, param_lists, variables, cfg):
+    """Returns the cache key of the figure of `stat` for these parameters."""
+
+    return _key(stat, ordered_vars, params, param_lists, variables, cfg)
+
+def lookup(key):
+    """Returns the cached figure of `key` (see `key`), or None."""
+
+    if budget() <= 0:
+        return None
+
+    return _lookup(key)
+
+def store(key, result, generation):
+    """
+    Caches the (fig, msg) `result` of `key`, computed outside of `plot`
+    (for instance in another process), unless the results were reloaded
+    since `generation()` returned `generation`.
+    """
+
+    result = _freeze_result(result)
+    if budget() > 0:
+        _store(key, result, generation)
+
+    return result
+
+def _cached_call(key, compute):
+    result = _lookup(key)
+    if result is None:
+        generation = _generation
+        result = _freeze_result(compute())
+        _store(key, result, generation)
+
+    return result
+
+def cached(do_plot):
+    """
+    Decorates the `do_plot` method of a stat, so that the figures are
+    only generated once for a given stat and set of parameters.
+
+    The figure is returned as a dict, which the callers must not modify.
+    """
+
+    @functools.wraps(do_plot)
+    def wrapper(self, ordered_vars, params, param_lists, variables, cfg):
+        if budget() <= 0:
+            return _freeze_result(do_plot(self, ordered_vars, params, param_lists, variables, cfg))
+
+        # computed before the call, do_plot may modify its arguments
+        key = _key(self, ordered_vars, params, param_lists, variables, cfg)
+
+        return _cached_call(key, lambda: do_plot(self, ordered_vars, params, param_lists, variables, cfg))
+
+    wrapper.figure_cached = True
+
+    return wrapper
+
+def plot(stat, ordered_vars, params, param_lists, variables, cfg):
+    """
+    Calls `stat.do_plot` through the cache, for the stats whose
+    `do_plot` isn't decorated with `cached` (like those of
+    MatrixBenchmarking). The figure is returned as a dict, like with
+    `cached`.
+    """
+
+    if getattr(stat.do_plot, "figure_cached", False):
+        return stat.do_plot(ordered_vars, params, param_lists, variables, cfg)
+
+    if budget() <= 0:
+        return _freeze_result(stat.do_plot(ordered_vars, params, param_lists, variables, cfg))
+
+    key = _key(stat, ordered_vars, params, param_lists, variables, cfg)
+
+    return _cached_call(key, lambda: stat.do_plot(ordered_vars, params, param_lists, variables, cfg))
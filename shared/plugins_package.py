@@ -0,0 +1,28 @@
+"""
+Makes the plugins of this repository importable as `plugins.*` from the
+scripts run directly (export.py, perf/bench_store.py), whatever the name
+of the repository directory.
+
+The scripts import this module from the `shared` directory, as the
+`plugins` package doesn't exist yet.
+"""
+
+import os
+import sys
+import importlib.util
+import importlib.machinery
+
+PLUGINS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_plugins_package():
+    """Makes the plugins of this repository importable as `plugins.*`."""
+
+    try:
+        import plugins
+        return
+    except ImportError:
+        pass
+
+    spec = importlib.machinery.ModuleSpec("plugins", None, is_package=True)
+    spec.submodule_search_locations = [PLUGINS_DIR]
+    sys.modules["plugins"] = importlib.util.module_from_spec(spec)
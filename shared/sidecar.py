@@ -0,0 +1,52 @@
+"""
+Helpers of the files the stores save next to the results they parsed,
+like the mlperf results cache and the Phoronix dataset.
+"""
+
+import os
+import hashlib
+import tempfile
+
+_parser_versions = {} # source file paths -> version
+
+def parser_version(module_file, fnames):
+    """
+    Returns the hash of the `fnames` source files of the parser, in the
+    directory of `module_file`, so that the files saved by another
+    version of the parser are ignored. Computed once per process.
+    """
+
+    this_dir = os.path.dirname(os.path.abspath(module_file))
+    paths = tuple(os.path.join(this_dir, fname) for fname in fnames)
+
+    if paths not in _parser_versions:
+        digest = hashlib.sha1()
+        for path in paths:
+            with open(path, "rb") as f:
+                digest.update(f.read())
+
+        _parser_versions[paths] = digest.hexdigest()
+
+    return _parser_versions[paths]
+
+def write_atomic(path, write, binary=False):
+    """
+    Creates or replaces the `path` file with the content written by
+    `write(f)`. The content is written to a temporary file renamed at
+    the end, so that the readers never see a partial file. The
+    temporary file is removed if `write` fails.
+    """
+
+    dirname, fname = os.path.split(path)
+    fd, tmp_fname = tempfile.mkstemp(dir=dirname, prefix=fname + ".")
+    try:
+        with os.fdopen(fd, "wb" if binary else "w") as f:
+            write(f)
+
+        # mkstemp only makes the file readable by its owner
+        os.chmod(tmp_fname, 0o644)
+        os.replace(tmp_fname, path)
+    except Exception:
+        if os.path.exists(tmp_fname):
+            os.unlink(tmp_fname)
+        raise